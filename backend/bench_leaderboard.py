@@ -0,0 +1,98 @@
+"""
+Benchmark del job de "trending" con 1M de ratings sobre SQLite.
+
+    python bench_leaderboard.py [n_ratings]
+
+Mide el refresh periódico (Leaderboard.compute), que debe quedar bajo 1 s
+independientemente de la cantidad de ratings, y como referencia el rebuild
+completo de trend_score.
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-leaderboard-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+from database import Base, SessionLocal, engine  # noqa: E402
+import models  # noqa: E402
+import leaderboard as lb  # noqa: E402
+
+N_RECIPES = 20_000
+N_COOKBOOKS = 2_000
+N_USERS = 50_000
+
+
+def seed(n_ratings: int):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.datetime.utcnow()
+    rnd = random.Random(42)
+
+    def created(max_days):
+        return now - datetime.timedelta(seconds=rnd.randint(0, max_days * 86400))
+
+    with engine.begin() as conn:
+        conn.execute(models.Recipe.__table__.insert(), [
+            {"id": i, "title": f"Receta {i}", "instructions": "", "ingredients": [], "created_at": created(365)}
+            for i in range(1, N_RECIPES + 1)
+        ])
+        conn.execute(models.Cookbook.__table__.insert(), [
+            {"id": i, "title": f"Recetario {i}", "created_at": created(365)}
+            for i in range(1, N_COOKBOOKS + 1)
+        ])
+        # Un voto por (usuario, receta/recetario): pares distintos, sin chocar
+        # con los índices únicos de ratings
+        n_recipe_ratings = int(n_ratings * 0.85)
+        for column, n_targets, count in (
+            ("recipe_id", N_RECIPES, n_recipe_ratings),
+            ("cookbook_id", N_COOKBOOKS, n_ratings - n_recipe_ratings),
+        ):
+            batch = []
+            for pair in rnd.sample(range(N_USERS * n_targets), count):
+                user_index, target_index = divmod(pair, n_targets)
+                batch.append({
+                    "score": rnd.randint(1, 5),
+                    "user_id": user_index + 1,
+                    column: target_index + 1,
+                    "created_at": created(90),
+                })
+                if len(batch) == 50_000:
+                    conn.execute(models.Rating.__table__.insert(), batch)
+                    batch = []
+            if batch:
+                conn.execute(models.Rating.__table__.insert(), batch)
+
+
+def main():
+    n_ratings = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Seeding {n_ratings:,} ratings ...")
+    seed(n_ratings)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        lb.rebuild_trend_scores(db)
+        print(f"rebuild_trend_scores: {time.perf_counter() - start:.2f} s (one-off)")
+
+        board = lb.Leaderboard()
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            board.compute(db)
+            timings.append(time.perf_counter() - start)
+        worst = max(timings)
+        print(f"Leaderboard.compute: best {min(timings) * 1000:.1f} ms, worst {worst * 1000:.1f} ms")
+        print("top recipes:", [(e["id"], round(e["score"], 2)) for e in board.top("recipe", 5)])
+        if worst >= 1.0:
+            print("FAIL: refresh is not sub-second")
+            sys.exit(1)
+        print("OK: refresh is sub-second")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
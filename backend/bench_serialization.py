@@ -0,0 +1,134 @@
+"""
+Benchmark de serialización de listados: camino ORM + pydantic vs. camino rápido
+(columnas -> dicts -> orjson) sobre SQLite.
+
+    python bench_serialization.py [rows ...]   (por defecto 100 1000 10000)
+
+Para cada tamaño mide la consulta más la codificación JSON completa de
+GET /recipes/ y GET /cookbooks/ (recetarios de 10 recetas).
+"""
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+_tmpdir = tempfile.mkdtemp(prefix="bench-serialization-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+import crud  # noqa: E402
+import models  # noqa: E402
+import schemas  # noqa: E402
+
+RECIPES_PER_COOKBOOK = 10
+REPEAT = 5
+
+
+def seed(n_recipes: int):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.datetime.utcnow()
+    rnd = random.Random(7)
+    n_cookbooks = max(1, n_recipes // RECIPES_PER_COOKBOOK)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, 101)
+        ])
+        conn.execute(models.Cookbook.__table__.insert(), [
+            {"id": i, "title": f"Recetario {i}", "description": "Descripción", "owner_id": rnd.randint(1, 100),
+             "created_at": now - datetime.timedelta(minutes=i)}
+            for i in range(1, n_cookbooks + 1)
+        ])
+        conn.execute(models.Recipe.__table__.insert(), [
+            {
+                "id": i,
+                "title": f"Receta {i}",
+                "ingredients": [
+                    {"name": f"ingrediente {j}", "amount": str(j), "unit": "g"} for j in range(8)
+                ],
+                "instructions": "Mezclar.\nHornear 30 minutos.\nServir.",
+                "instructions_format": "numbered",
+                "country": rnd.choice(["Chile", "Perú", "México", "Argentina"]),
+                "type": rnd.choice(["Entrada", "Fondo", "Postre"]),
+                "difficulty": "medium",
+                "preparation_time_minutes": 30,
+                "owner_id": rnd.randint(1, 100),
+                "rating_sum": 8,
+                "rating_count": 2,
+                "created_at": now - datetime.timedelta(seconds=i),
+            }
+            for i in range(1, n_recipes + 1)
+        ])
+        conn.execute(models.CookbookRecipe.__table__.insert(), [
+            {"cookbook_id": (i - 1) // RECIPES_PER_COOKBOOK + 1, "recipe_id": i, "position": (i - 1) % RECIPES_PER_COOKBOOK}
+            for i in range(1, n_recipes + 1)
+        ])
+
+
+def encode_like_fastapi(adapter: TypeAdapter, objects) -> bytes:
+    # Lo que hace FastAPI con response_model: validar, jsonable_encoder y json.dumps
+    validated = adapter.validate_python(objects, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+
+def normalized(raw: bytes):
+    # Sin ORDER BY el orden de filas no está garantizado: se compara por id
+    documents = sorted(json.loads(raw), key=lambda d: d["id"])
+    for document in documents:
+        if "recipes" in document:
+            document["recipes"].sort(key=lambda d: d["id"])
+    return documents
+
+
+def timed(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 10_000]
+    seed(max(sizes))
+    recipes_adapter = TypeAdapter(List[schemas.Recipe])
+    cookbooks_adapter = TypeAdapter(List[schemas.Cookbook])
+
+    print(f"{'endpoint':<10} {'rows':>7} {'orm+pydantic':>14} {'fast':>10} {'speedup':>8}")
+    for size in sizes:
+        n_cookbooks = max(1, size // RECIPES_PER_COOKBOOK)
+        cases = [
+            (
+                "recipes", size,
+                lambda: encode_like_fastapi(recipes_adapter, crud.get_recipes(db, limit=size)),
+                lambda: orjson.dumps(crud.get_recipe_rows(db, limit=size)),
+            ),
+            (
+                "cookbooks", n_cookbooks,
+                lambda: encode_like_fastapi(cookbooks_adapter, crud.get_cookbooks(db, limit=n_cookbooks)),
+                lambda: orjson.dumps(crud.get_cookbook_rows(db, limit=n_cookbooks)),
+            ),
+        ]
+        for name, rows, slow, fast in cases:
+            db = SessionLocal()
+            try:
+                # Ambos caminos deben producir el mismo documento
+                assert normalized(slow()) == normalized(fast()), f"{name}: outputs differ"
+                slow_time = timed(lambda: (db.expunge_all(), slow()))
+                fast_time = timed(fast)
+            finally:
+                db.close()
+            print(f"{name:<10} {rows:>7} {slow_time * 1000:>11.1f} ms {fast_time * 1000:>7.1f} ms {slow_time / fast_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+from typing import AsyncIterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import crud
+import schemas
+
+# Importación masiva de recetas desde NDJSON (una receta por línea).
+# El cuerpo se lee como stream, se valida con schemas.RecipeCreate y se inserta
+# por lotes de BULK_BATCH_SIZE, cada uno en su propia transacción: un lote que
+# falla no deshace los anteriores. Los errores se reportan por número de línea.
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 500))
+BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", 1024 * 1024))
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("BULK_MAX_REPORTED_ERRORS", 1000))
+
+_TOO_LONG = object()
+
+
+async def iter_lines(stream: AsyncIterator[bytes], max_line_bytes: int = BULK_MAX_LINE_BYTES):
+    """(número de línea, bytes) desde un stream de bloques; líneas demasiado largas -> _TOO_LONG."""
+    buffer = bytearray()
+    line_no = 0
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line_no += 1
+            line = bytes(buffer[:newline])
+            del buffer[:newline + 1]
+            if skipping:
+                # Resto de una línea que ya se reportó como demasiado larga
+                skipping = False
+                continue
+            yield line_no, line
+        if len(buffer) > max_line_bytes and not skipping:
+            # No se acumula la línea completa en memoria: se descarta hasta el próximo salto
+            yield line_no + 1, _TOO_LONG
+            skipping = True
+            buffer.clear()
+        elif skipping:
+            buffer.clear()
+    if buffer and not skipping:
+        yield line_no + 1, bytes(buffer)
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[schemas.BulkImportError] = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_REPORTED_ERRORS:
+            self.errors.append(schemas.BulkImportError(line=line, error=message))
+
+    def result(self) -> schemas.BulkImportResult:
+        return schemas.BulkImportResult(inserted=self.inserted, failed=self.failed, errors=self.errors)
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'line'}: {err['msg']}" for err in exc.errors()
+    )
+
+
+def insert_batch(db: Session, batch: List[Tuple[int, schemas.RecipeCreate]], user_id: int, report: ImportReport):
+    """Verifica los recetarios del lote y lo inserta en una transacción."""
+    cookbook_ids = {recipe.cookbook_id for _, recipe in batch if recipe.cookbook_id}
+    owned = crud.owned_cookbook_ids(db, cookbook_ids, user_id)
+    valid = []
+    for line, recipe in batch:
+        if recipe.cookbook_id and recipe.cookbook_id not in owned:
+            report.error(line, "cookbook_id: cookbook not found or not owned by you")
+        else:
+            valid.append((line, recipe))
+    if not valid:
+        return
+    try:
+        crud.bulk_create_recipes(db, [recipe for _, recipe in valid], user_id)
+        report.inserted += len(valid)
+    except SQLAlchemyError as exc:
+        db.rollback()
+        message = f"batch insert failed: {exc.__class__.__name__}"
+        for line, _ in valid:
+            report.error(line, message)
+
+
+async def import_ndjson(stream: AsyncIterator[bytes], db: Session, user_id: int,
+                        batch_size: int = BULK_BATCH_SIZE) -> schemas.BulkImportResult:
+    report = ImportReport()
+    batch: List[Tuple[int, schemas.RecipeCreate]] = []
+    async for line_no, line in iter_lines(stream):
+        if line is _TOO_LONG:
+            report.error(line_no, f"line exceeds {BULK_MAX_LINE_BYTES} bytes")
+            continue
+        if not line.strip():
+            continue
+        try:
+            batch.append((line_no, schemas.RecipeCreate.model_validate_json(line)))
+        except ValidationError as exc:
+            report.error(line_no, _validation_message(exc))
+        if len(batch) >= batch_size:
+            await run_in_threadpool(insert_batch, db, batch, user_id, report)
+            batch = []
+    if batch:
+        await run_in_threadpool(insert_batch, db, batch, user_id, report)
+    return report.result()
@@ -1,18 +1,26 @@
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 import models, schemas
-import bcrypt
+from pagination import apply_keyset, build_page
+import serializers
+import ingredient_index
+import facets
+import leaderboard
+import datetime
+from services.document_cache import document_cache
+from services import password_hasher
+from token_revocation import revocation_list
 
+# Versiones sync (scripts como seed_data). Los endpoints usan
+# services.password_hasher, que corre bcrypt fuera del event loop y del threadpool.
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica que la contraseña coincida con el hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return password_hasher.verify_password_sync(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Genera un hash bcrypt de la contraseña"""
-    # Generar salt y hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Genera un hash bcrypt de la contraseña (costo BCRYPT_ROUNDS)"""
+    return password_hasher.hash_password_sync(password)
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -20,37 +28,180 @@ def get_user(db: Session, user_id: int):
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def get_cookbooks(db: Session, skip: int = 0, limit: int = 100, search: str = None):
-    query = db.query(models.Cookbook).options(joinedload(models.Cookbook.owner))
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+# --- Refresh tokens ---
+def create_refresh_token(db: Session, user_id: int, token_version: int, jti: str, expires_at: datetime.datetime):
+    db.add(models.RefreshToken(id=jti, user_id=user_id, token_version=token_version, expires_at=expires_at))
+    db.commit()
+
+def rotate_refresh_token(db: Session, jti: str):
+    """
+    Marca el refresh token como usado y devuelve (token, user). Si ya estaba
+    usado (posible robo) revoca todas las sesiones del usuario y devuelve None.
+    """
+    token = db.query(models.RefreshToken).filter(models.RefreshToken.id == jti).with_for_update().first()
+    if token is None:
+        return None
+    if token.revoked_at is not None:
+        revoke_user_tokens(db, token.user_id)
+        return None
+    user = db.query(models.User).filter(models.User.id == token.user_id).first()
+    if user is None or token.expires_at < datetime.datetime.utcnow() or token.token_version != user.token_version:
+        return None
+    token.revoked_at = datetime.datetime.utcnow()
+    db.commit()
+    return token, user
+
+def revoke_refresh_token(db: Session, jti: str, user_id: int):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.id == jti,
+        models.RefreshToken.user_id == user_id,
+        models.RefreshToken.revoked_at.is_(None),
+    ).update({models.RefreshToken.revoked_at: datetime.datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def revoke_user_tokens(db: Session, user_id: int) -> int:
+    """Incrementa token_version: invalida todos los tokens emitidos. Devuelve la nueva versión."""
+    now = datetime.datetime.utcnow()
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.token_version: models.User.token_version + 1, models.User.tokens_revoked_at: now},
+        synchronize_session=False,
+    )
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id, models.RefreshToken.revoked_at.is_(None)
+    ).update({models.RefreshToken.revoked_at: now}, synchronize_session=False)
+    db.commit()
+    version = db.query(models.User.token_version).filter(models.User.id == user_id).scalar()
+    revocation_list.record(user_id, version)
+    return version
+
+# --- Estrategia de carga de relaciones ---
+# depth 0: solo owner; 1: + recetas; 2: + owner de cada receta.
+# Las colecciones se cargan con selectinload: una consulta "IN (...)" por nivel
+# para toda la página, en vez de una consulta lazy por cada recetario/receta.
+# Las recetas llegan en el orden del recetario: un JOIN con cookbook_recipes
+# filtrado por cookbook_id y ordenado por position (índice cookbook_id, position).
+COOKBOOK_FULL_DEPTH = 2
+
+def cookbook_loader_options(depth: int = COOKBOOK_FULL_DEPTH):
+    options = [joinedload(models.Cookbook.owner)]
+    if depth >= 1:
+        recipes_loader = selectinload(models.Cookbook.recipes)
+        if depth >= 2:
+            recipes_loader = recipes_loader.joinedload(models.Recipe.owner)
+        options.append(recipes_loader)
+    return options
+
+def _filter_cookbooks(query, search: str = None):
     if search:
         query = query.filter(models.Cookbook.title.contains(search))
+    return query
+
+def _cookbooks_query(db: Session, search: str = None, depth: int = COOKBOOK_FULL_DEPTH):
+    return _filter_cookbooks(db.query(models.Cookbook).options(*cookbook_loader_options(depth)), search)
+
+def get_cookbooks(db: Session, skip: int = 0, limit: int = 100, search: str = None, depth: int = COOKBOOK_FULL_DEPTH, sort: str = None):
+    query = _cookbooks_query(db, search=search, depth=depth)
+    if sort == "rating":
+        query = _sort_by_rating(query, models.Cookbook)
     return query.offset(skip).limit(limit).all()
 
+def get_cookbooks_page(db: Session, cursor: str = None, limit: int = 100, search: str = None, depth: int = COOKBOOK_FULL_DEPTH):
+    """Paginación por cursor (created_at, id). Retorna (items, next_cursor)."""
+    query = apply_keyset(_cookbooks_query(db, search=search, depth=depth), models.Cookbook, cursor, limit)
+    return build_page(query.all(), limit)
+
+# Variantes "rápidas" (ver serializers.py): devuelven dicts listos para JSON
+def get_cookbook_rows(db: Session, skip: int = 0, limit: int = 100, search: str = None, sort: str = None):
+    query = _filter_cookbooks(serializers.cookbook_rows_query(db), search)
+    if sort == "rating":
+        query = _sort_by_rating(query, models.Cookbook)
+    return serializers.cookbook_rows(db, query.offset(skip).limit(limit).all())
+
+def get_cookbook_rows_page(db: Session, cursor: str = None, limit: int = 100, search: str = None):
+    query = apply_keyset(_filter_cookbooks(serializers.cookbook_rows_query(db), search), models.Cookbook, cursor, limit)
+    rows, next_cursor = build_page(query.all(), limit)
+    return serializers.cookbook_rows(db, rows), next_cursor
+
+def summarize_cookbooks(db: Session, cookbooks, titles_per_cookbook: int = 3):
+    """
+    Vista compacta: cantidad de recetas y primeros N títulos por recetario.
+    Dos consultas agregadas para toda la página (cargar con depth=0).
+    """
+    ids = [cb.id for cb in cookbooks]
+    counts = {}
+    titles = {}
+    if ids:
+        membership = models.CookbookRecipe
+        counts = dict(
+            db.query(membership.cookbook_id, func.count(membership.recipe_id))
+            .filter(membership.cookbook_id.in_(ids))
+            .group_by(membership.cookbook_id)
+            .all()
+        )
+        position = func.row_number().over(
+            partition_by=membership.cookbook_id, order_by=[membership.position, membership.recipe_id]
+        ).label("position")
+        ranked = (
+            db.query(membership.cookbook_id, models.Recipe.title, position)
+            .join(models.Recipe, models.Recipe.id == membership.recipe_id)
+            .filter(membership.cookbook_id.in_(ids))
+            .subquery()
+        )
+        rows = (
+            db.query(ranked.c.cookbook_id, ranked.c.title)
+            .filter(ranked.c.position <= titles_per_cookbook)
+            .order_by(ranked.c.cookbook_id, ranked.c.position)
+            .all()
+        )
+        for cookbook_id, title in rows:
+            titles.setdefault(cookbook_id, []).append(title)
+
+    return [
+        {
+            "id": cb.id,
+            "title": cb.title,
+            "description": cb.description,
+            "owner_id": cb.owner_id,
+            "created_at": cb.created_at,
+            "owner": cb.owner,
+            "recipe_count": counts.get(cb.id, 0),
+            "recipe_titles": titles.get(cb.id, []),
+        }
+        for cb in cookbooks
+    ]
+
 def create_cookbook(db: Session, cookbook: schemas.CookbookCreate, user_id: int):
     # Extraer recipe_ids del dict porque no es columna del modelo
     cookbook_data = cookbook.dict()
     recipe_ids = cookbook_data.pop('recipe_ids', [])
     
     db_cookbook = models.Cookbook(**cookbook_data, owner_id=user_id)
-    
-    if recipe_ids:
-        # Buscar recetas del usuario que coincidan con los IDs
-        recipes = db.query(models.Recipe).filter(
-            models.Recipe.id.in_(recipe_ids),
-            models.Recipe.owner_id == user_id
-        ).all()
-        db_cookbook.recipes = recipes
-        
+    epoch = leaderboard.cached_epoch(db)
+    db_cookbook.trend_score = leaderboard.creation_score(epoch)
     db.add(db_cookbook)
+    db.flush()  # Necesitamos el id para asignar las recetas
+    leaderboard.settle_created(db, "cookbook", [db_cookbook.id], epoch)
+
+    # Solo recetas del usuario (verificado en SQL)
+    change = _add_cookbook_recipes(db, db_cookbook.id, recipe_ids, user_id)
+    _bump_list_versions(db, "cookbooks")
     db.commit()
+    change.invalidate()
     db.refresh(db_cookbook)
     return db_cookbook
 
@@ -65,43 +216,263 @@ def update_cookbook(db: Session, cookbook_id: int, cookbook: schemas.CookbookUpd
         for key, value in update_data.items():
             setattr(db_cookbook, key, value)
             
-        # Actualizar recetas si se proporcionaron
+        # Reemplazar recetas si se proporcionaron (deben ser del mismo dueño)
+        change = MembershipChange(cookbook_id)
         if recipe_ids is not None:
-            # Buscar las nuevas recetas seleccionadas (deben ser del mismo dueño)
-            new_recipes = db.query(models.Recipe).filter(
-                models.Recipe.id.in_(recipe_ids),
-                models.Recipe.owner_id == db_cookbook.owner_id
-            ).all()
-            
-            # Asignar la nueva lista de recetas (SQLAlchemy maneja la actualización de FKs)
-            # Las recetas que estaban antes y no están ahora tendrán cookbook_id=NULL
-            db_cookbook.recipes = new_recipes
+            change = _replace_cookbook_recipes(db, cookbook_id, recipe_ids, db_cookbook.owner_id)
 
+        _bump_list_versions(db, "cookbooks")
         db.commit()
+        change.invalidate()
         db.refresh(db_cookbook)
     return db_cookbook
 
-def get_recipes(db: Session, skip: int = 0, limit: int = 100, country: str = None, type: str = None):
-    query = db.query(models.Recipe).options(joinedload(models.Recipe.owner))
+# --- Membresía receta/recetario por conjuntos ---
+# La pertenencia vive en cookbook_recipes (cookbook_id, recipe_id, position):
+# una receta puede estar en varios recetarios. Cada operación es un INSERT o
+# DELETE por conjuntos con el dueño verificado en SQL, sin cargar recetas como
+# objetos ORM. Las recetas nuevas se agregan al final (max(position) + 1).
+class MembershipChange:
+    def __init__(self, cookbook_id: int):
+        self.cookbook_id = cookbook_id
+        self.added = []
+        self.removed = []
+
+    def invalidate(self):
+        # El documento de la receta no incluye sus recetarios: solo cambia el del recetario
+        invalidate_documents(cookbook_ids=[self.cookbook_id])
+
+def _touch_cookbook(db: Session, cookbook_id: int):
+    # La versión (ETag) del recetario cambia aunque sus recetas no se modifiquen
+    db.query(models.Cookbook).filter(models.Cookbook.id == cookbook_id).update(
+        {models.Cookbook.updated_at: datetime.datetime.utcnow()}, synchronize_session=False
+    )
+
+def _next_position(db: Session, cookbook_id: int) -> int:
+    last = db.query(func.max(models.CookbookRecipe.position)).filter(
+        models.CookbookRecipe.cookbook_id == cookbook_id
+    ).scalar()
+    return 0 if last is None else last + 1
+
+def _owned_recipe_ids(db: Session, recipe_ids, owner_id: int):
+    rows = db.query(models.Recipe.id).filter(
+        models.Recipe.id.in_(set(recipe_ids)), models.Recipe.owner_id == owner_id
+    )
+    return {row.id for row in rows}
+
+def _insert_memberships(db: Session, cookbook_id: int, recipe_ids, start: int):
+    db.execute(insert(models.CookbookRecipe), [
+        {"cookbook_id": cookbook_id, "recipe_id": recipe_id, "position": start + i}
+        for i, recipe_id in enumerate(recipe_ids)
+    ])
+
+def _add_cookbook_recipes(db: Session, cookbook_id: int, recipe_ids, owner_id: int, change: MembershipChange = None):
+    change = change or MembershipChange(cookbook_id)
+    wanted = list(dict.fromkeys(recipe_ids))  # Sin duplicados, en el orden pedido
+    if not wanted:
+        return change
+    present = {
+        row.recipe_id for row in db.query(models.CookbookRecipe.recipe_id).filter(
+            models.CookbookRecipe.cookbook_id == cookbook_id, models.CookbookRecipe.recipe_id.in_(wanted)
+        )
+    }
+    owned = _owned_recipe_ids(db, wanted, owner_id)
+    added = [recipe_id for recipe_id in wanted if recipe_id in owned and recipe_id not in present]
+    if added:
+        _insert_memberships(db, cookbook_id, added, _next_position(db, cookbook_id))
+        _touch_cookbook(db, cookbook_id)
+        change.added.extend(added)
+    return change
+
+def _remove_cookbook_recipes(db: Session, cookbook_id: int, condition, change: MembershipChange = None):
+    change = change or MembershipChange(cookbook_id)
+    condition = (models.CookbookRecipe.cookbook_id == cookbook_id, *condition)
+    removed = [row.recipe_id for row in db.query(models.CookbookRecipe.recipe_id).filter(*condition)]
+    if removed:
+        db.query(models.CookbookRecipe).filter(*condition).delete(synchronize_session=False)
+        _touch_cookbook(db, cookbook_id)
+        change.removed.extend(removed)
+    return change
+
+def _replace_cookbook_recipes(db: Session, cookbook_id: int, recipe_ids, owner_id: int):
+    """Deja exactamente recipe_ids (las del dueño), con position según el orden de la lista."""
+    change = MembershipChange(cookbook_id)
+    owned = _owned_recipe_ids(db, recipe_ids, owner_id) if recipe_ids else set()
+    wanted = [recipe_id for recipe_id in dict.fromkeys(recipe_ids) if recipe_id in owned]
+    current = {
+        row.recipe_id for row in db.query(models.CookbookRecipe.recipe_id).filter(
+            models.CookbookRecipe.cookbook_id == cookbook_id
+        )
+    }
+    # Reescribir todas las filas también aplica el nuevo orden de las que se mantienen
+    db.query(models.CookbookRecipe).filter(
+        models.CookbookRecipe.cookbook_id == cookbook_id
+    ).delete(synchronize_session=False)
+    if wanted:
+        _insert_memberships(db, cookbook_id, wanted, 0)
+    _touch_cookbook(db, cookbook_id)
+    change.added = [recipe_id for recipe_id in wanted if recipe_id not in current]
+    change.removed = sorted(current - set(wanted))
+    return change
+
+def get_cookbook_owner_id(db: Session, cookbook_id: int):
+    """Dueño del recetario (None si no existe), sin cargar recetas."""
+    return db.query(models.Cookbook.owner_id).filter(models.Cookbook.id == cookbook_id).scalar()
+
+def change_cookbook_recipes(db: Session, cookbook_id: int, owner_id: int, add=(), remove=(), replace=None):
+    """add/remove incrementales o replace completo, en una transacción. Devuelve MembershipChange."""
+    if replace is not None:
+        change = _replace_cookbook_recipes(db, cookbook_id, replace, owner_id)
+    else:
+        change = MembershipChange(cookbook_id)
+        if remove:
+            _remove_cookbook_recipes(db, cookbook_id, (models.CookbookRecipe.recipe_id.in_(set(remove)),), change)
+        if add:
+            _add_cookbook_recipes(db, cookbook_id, add, owner_id, change)
+    _bump_list_versions(db, "cookbooks")
+    db.commit()
+    change.invalidate()
+    return change
+
+def get_recipe_cookbook_ids(db: Session, recipe_ids):
+    """Recetarios que incluyen alguna de las recetas (índice por recipe_id)."""
+    if not recipe_ids:
+        return []
+    rows = db.query(models.CookbookRecipe.cookbook_id).filter(
+        models.CookbookRecipe.recipe_id.in_(set(recipe_ids))
+    ).distinct()
+    return [row.cookbook_id for row in rows]
+
+def _filter_recipes(query, country: str = None, type: str = None):
     if country:
         query = query.filter(models.Recipe.country == country)
     if type:
         query = query.filter(models.Recipe.type == type)
+    return query
+
+def _recipes_query(db: Session, country: str = None, type: str = None):
+    return _filter_recipes(db.query(models.Recipe).options(joinedload(models.Recipe.owner)), country, type)
+
+def _sort_by_rating(query, model):
+    # Usa los agregados denormalizados: sin GROUP BY sobre ratings
+    return query.order_by(
+        model.rating_average.desc().nullslast(), model.rating_count.desc(), model.id.desc()
+    )
+
+def get_recipes(db: Session, skip: int = 0, limit: int = 100, country: str = None, type: str = None, sort: str = None):
+    query = _recipes_query(db, country=country, type=type)
+    if sort == "rating":
+        query = _sort_by_rating(query, models.Recipe)
     return query.offset(skip).limit(limit).all()
 
+def get_recipes_page(db: Session, cursor: str = None, limit: int = 100, country: str = None, type: str = None):
+    """Paginación por cursor (created_at, id). Retorna (items, next_cursor)."""
+    query = apply_keyset(_recipes_query(db, country=country, type=type), models.Recipe, cursor, limit)
+    return build_page(query.all(), limit)
+
+def get_recipe_rows(db: Session, skip: int = 0, limit: int = 100, country: str = None, type: str = None, sort: str = None):
+    query = _filter_recipes(serializers.recipe_rows_query(db), country, type)
+    if sort == "rating":
+        query = _sort_by_rating(query, models.Recipe)
+    return [serializers.recipe_row(row) for row in query.offset(skip).limit(limit)]
+
+def get_recipe_rows_page(db: Session, cursor: str = None, limit: int = 100, country: str = None, type: str = None):
+    query = apply_keyset(_filter_recipes(serializers.recipe_rows_query(db), country, type), models.Recipe, cursor, limit)
+    rows, next_cursor = build_page(query.all(), limit)
+    return [serializers.recipe_row(row) for row in rows], next_cursor
+
 def create_recipe(db: Session, recipe: schemas.RecipeCreate, user_id: int):
-    db_recipe = models.Recipe(**recipe.dict(), owner_id=user_id)
+    recipe_data = recipe.dict()
+    cookbook_id = recipe_data.pop("cookbook_id", None)
+    db_recipe = models.Recipe(**recipe_data, owner_id=user_id)
+    epoch = leaderboard.cached_epoch(db)
+    db_recipe.trend_score = leaderboard.creation_score(epoch)
     db.add(db_recipe)
+    db.flush()  # Necesitamos el id para el índice de ingredientes
+    leaderboard.settle_created(db, "recipe", [db_recipe.id], epoch)
+    ingredient_index.sync_recipe(db, db_recipe.id, db_recipe.ingredients)
+    facets.apply_change(db, None, facets.facet_values(db_recipe))
+    if cookbook_id:
+        _add_cookbook_recipes(db, cookbook_id, [db_recipe.id], user_id)
+    _bump_list_versions(db, "recipes", "cookbooks" if cookbook_id else None)
     db.commit()
+    facets.invalidate()
+    invalidate_documents(cookbook_ids=[cookbook_id] if cookbook_id else [])
     db.refresh(db_recipe)
     return db_recipe
 
+def bulk_create_recipes(db: Session, recipes, user_id: int):
+    """
+    Inserta un lote de recetas ya validadas (schemas.RecipeCreate) en una sola
+    transacción: INSERT multi-fila con RETURNING, claves de ingredientes e
+    incrementos de facetas agregados por lote. Devuelve los ids en orden.
+    """
+    if not recipes:
+        return []
+    epoch = leaderboard.cached_epoch(db)
+    trend_score = leaderboard.creation_score(epoch)
+    rows = [{**recipe.dict(exclude={"cookbook_id"}), "owner_id": user_id, "trend_score": trend_score} for recipe in recipes]
+    ids = db.scalars(
+        insert(models.Recipe).returning(models.Recipe.id, sort_by_parameter_order=True), rows
+    ).all()
+    keys = [
+        {"recipe_id": recipe_id, "name": key}
+        for recipe_id, row in zip(ids, rows)
+        for key in ingredient_index.index_keys(row["ingredients"])
+    ]
+    leaderboard.settle_created(db, "recipe", ids, epoch)
+    if keys:
+        db.execute(insert(models.RecipeIngredient), keys)
+    facets.apply_counts(db, rows)
+    # Recetas agregadas al final de su recetario, en el orden del lote
+    by_cookbook = {}
+    for recipe_id, recipe in zip(ids, recipes):
+        if recipe.cookbook_id:
+            by_cookbook.setdefault(recipe.cookbook_id, []).append(recipe_id)
+    for cookbook_id, recipe_ids in by_cookbook.items():
+        _insert_memberships(db, cookbook_id, recipe_ids, _next_position(db, cookbook_id))
+        _touch_cookbook(db, cookbook_id)
+    _bump_list_versions(db, "recipes", "cookbooks" if by_cookbook else None)
+    db.commit()
+    facets.invalidate()
+    invalidate_documents(cookbook_ids=list(by_cookbook))
+    return ids
+
+def owned_cookbook_ids(db: Session, cookbook_ids, user_id: int):
+    if not cookbook_ids:
+        return set()
+    rows = db.query(models.Cookbook.id).filter(
+        models.Cookbook.id.in_(cookbook_ids), models.Cookbook.owner_id == user_id
+    ).all()
+    return {row.id for row in rows}
+
+def export_recipes(db: Session, country: str = None, type: str = None, owner_id: int = None, batch_size: int = 1000):
+    """
+    Itera todas las recetas como dicts (forma de schemas.Recipe) en orden de id.
+    yield_per usa un cursor del lado servidor en Postgres: memoria constante.
+    """
+    query = _filter_recipes(serializers.recipe_rows_query(db), country, type)
+    if owner_id is not None:
+        query = query.filter(models.Recipe.owner_id == owner_id)
+    for row in query.order_by(models.Recipe.id).yield_per(batch_size):
+        yield serializers.recipe_row(row)
+
 def update_recipe(db: Session, recipe_id: int, recipe: schemas.RecipeCreate):
     db_recipe = db.query(models.Recipe).filter(models.Recipe.id == recipe_id).first()
     if db_recipe:
-        for key, value in recipe.dict().items():
+        old_facets = facets.facet_values(db_recipe)
+        recipe_data = recipe.dict()
+        cookbook_id = recipe_data.pop("cookbook_id", None)
+        for key, value in recipe_data.items():
             setattr(db_recipe, key, value)
+        ingredient_index.sync_recipe(db, db_recipe.id, db_recipe.ingredients)
+        facets.apply_change(db, old_facets, facets.facet_values(db_recipe))
+        if cookbook_id:
+            _add_cookbook_recipes(db, cookbook_id, [recipe_id], db_recipe.owner_id)
+        _bump_list_versions(db, "recipes", "cookbooks")
         db.commit()
+        facets.invalidate()
+        invalidate_documents([recipe_id], get_recipe_cookbook_ids(db, [recipe_id]))
         db.refresh(db_recipe)
     return db_recipe
 
@@ -110,23 +481,223 @@ def get_recipe(db: Session, recipe_id: int):
 
 def get_cookbook(db: Session, cookbook_id: int):
     return db.query(models.Cookbook).options(
-        joinedload(models.Cookbook.owner),
-        joinedload(models.Cookbook.recipes).joinedload(models.Recipe.owner)
+        *cookbook_loader_options(COOKBOOK_FULL_DEPTH)
     ).filter(models.Cookbook.id == cookbook_id).first()
 
+# --- Documentos cacheados (vistas de detalle) ---
+# get_*_document devuelven el schema ya serializado (dict) desde document_cache,
+# solo si la entrada es de `version` (get_*_version, la misma del ETag). Toda
+# función de escritura además invalida, después del commit, los documentos que
+# cambian: la receta y los recetarios que la incluyen (antes y después).
+def get_recipe_document(db: Session, recipe_id: int, version):
+    def load():
+        db_recipe = get_recipe(db, recipe_id)
+        return schemas.Recipe.model_validate(db_recipe) if db_recipe else None
+    return document_cache.get_or_load("recipe", recipe_id, version, load)
+
+def get_cookbook_document(db: Session, cookbook_id: int, version):
+    def load():
+        db_cookbook = get_cookbook(db, cookbook_id)
+        return schemas.Cookbook.model_validate(db_cookbook) if db_cookbook else None
+    return document_cache.get_or_load("cookbook", cookbook_id, version, load)
+
+def invalidate_documents(recipe_ids=(), cookbook_ids=()):
+    document_cache.invalidate("recipe", *set(recipe_ids))
+    document_cache.invalidate("cookbook", *set(cookbook_ids))
+
+# --- Versiones para ETags ---
+# Consultas livianas (sin cargar ni serializar filas) que cambian cada vez que
+# cambia el contenido de la respuesta: updated_at se actualiza en cada UPDATE,
+# incluidos los ajustes de rating, y el conteo cubre los DELETE.
+# Los listados usan list_versions: una fila por listado que las escrituras que
+# lo cambian incrementan en su transacción, en lugar de agregar sobre la tabla
+# completa en cada GET. Los recetarios anidan recetas, así que los cambios de
+# una receta también incrementan "cookbooks" si está en alguno. Los votos no
+# incrementan nada (serializarían todas las escrituras en una fila): el ETag
+# del listado incluye una ventana de tiempo (http_cache.list_window).
+def get_recipe_version(db: Session, recipe_id: int):
+    row = db.query(models.Recipe.updated_at).filter(models.Recipe.id == recipe_id).first()
+    return row.updated_at if row else None
+
+def get_cookbook_version(db: Session, cookbook_id: int):
+    row = db.query(models.Cookbook.updated_at).filter(models.Cookbook.id == cookbook_id).first()
+    if row is None:
+        return None
+    recipes = db.query(func.count(models.Recipe.id), func.max(models.Recipe.updated_at)).join(
+        models.CookbookRecipe, models.CookbookRecipe.recipe_id == models.Recipe.id
+    ).filter(models.CookbookRecipe.cookbook_id == cookbook_id).one()
+    return (row.updated_at, *recipes)
+
+def get_list_version(db: Session, name: str):
+    return db.query(models.ListVersion.version).filter(models.ListVersion.name == name).scalar()
+
+def _bump_list_versions(db: Session, *names):
+    """Incrementa las versiones de los listados dados (None se ignora). No hace commit."""
+    names = sorted(name for name in set(names) if name)
+    query = db.query(models.ListVersion).filter(models.ListVersion.name.in_(names))
+    updated = query.update({models.ListVersion.version: models.ListVersion.version + 1}, synchronize_session=False)
+    if updated < len(names):  # Base creada sin migraciones
+        existing = {row.name for row in db.query(models.ListVersion.name).filter(models.ListVersion.name.in_(names))}
+        db.add_all(models.ListVersion(name=name, version=1) for name in names if name not in existing)
+
 def delete_recipe(db: Session, recipe_id: int):
     db_recipe = db.query(models.Recipe).filter(models.Recipe.id == recipe_id).first()
     if db_recipe:
+        cookbook_ids = get_recipe_cookbook_ids(db, [recipe_id])
+        facets.apply_change(db, facets.facet_values(db_recipe), None)
+        db.query(models.Rating).filter(models.Rating.recipe_id == recipe_id).delete(synchronize_session=False)
+        db.query(models.CookbookRecipe).filter(
+            models.CookbookRecipe.recipe_id == recipe_id
+        ).delete(synchronize_session=False)
         db.delete(db_recipe)
+        _bump_list_versions(db, "recipes", "cookbooks" if cookbook_ids else None)
         db.commit()
+        facets.invalidate()
+        invalidate_documents([recipe_id], cookbook_ids)
     return db_recipe
 
 def delete_cookbook(db: Session, cookbook_id: int):
     db_cookbook = db.query(models.Cookbook).filter(models.Cookbook.id == cookbook_id).first()
     if db_cookbook:
-        db.delete(db_cookbook)
+        # Solo se borra la pertenencia: las recetas siguen existiendo (un DELETE)
+        change = _remove_cookbook_recipes(db, cookbook_id, ())
+        db.query(models.Rating).filter(models.Rating.cookbook_id == cookbook_id).delete(synchronize_session=False)
+        db.query(models.Cookbook).filter(models.Cookbook.id == cookbook_id).delete(synchronize_session=False)
+        _bump_list_versions(db, "cookbooks")
         db.commit()
+        change.invalidate()
     return db_cookbook
 
+MAX_QUERY_INGREDIENTS = 50
+
+def find_recipes_by_ingredients(db: Session, names, limit: int = 20):
+    """
+    "¿Qué cocino con esto?": recetas ordenadas por cuántos de los ingredientes
+    dados contienen. Solo lee el índice (name, recipe_id) para el ranking.
+    Retorna dicts {recipe, matched, missing}.
+    """
+    terms = ingredient_index.query_terms(names)[:MAX_QUERY_INGREDIENTS]
+    if not terms:
+        return []
+    # Cada clave cuenta para el primer término que la usa: matched = términos cubiertos
+    term_of = {}
+    for index, keys in enumerate(terms):
+        for key in keys:
+            term_of.setdefault(key, index)
+
+    matched = func.count(func.distinct(case(term_of, value=models.RecipeIngredient.name))).label("matched")
+    rows = (
+        db.query(models.RecipeIngredient.recipe_id, matched)
+        .filter(models.RecipeIngredient.name.in_(list(term_of)))
+        .group_by(models.RecipeIngredient.recipe_id)
+        .order_by(matched.desc(), models.RecipeIngredient.recipe_id.desc())
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return []
+
+    recipes = db.query(models.Recipe).options(joinedload(models.Recipe.owner)).filter(
+        models.Recipe.id.in_([r.recipe_id for r in rows])
+    ).all()
+    by_id = {r.id: r for r in recipes}
+    wanted = set(term_of)
+
+    results = []
+    for recipe_id, matched_count in rows:
+        recipe = by_id.get(recipe_id)
+        if recipe is None:
+            continue
+        # Ingredientes de la receta que no cubre la lista dada
+        missing = sum(
+            1 for ing in recipe.ingredients or []
+            if not (ingredient_index.index_keys([ing]) & wanted)
+        )
+        results.append({"recipe": recipe, "matched": matched_count, "missing": missing})
+    return results
+
 def get_unique_countries(db: Session):
-    return db.query(models.Recipe.country).distinct().filter(models.Recipe.country.isnot(None)).all()
+    # Desde la tabla de facetas (con caché), sin DISTINCT sobre recipes
+    return sorted(facets.get_facets(db).get("country", {}))
+
+def get_recipe_facets(db: Session):
+    return facets.get_facets(db)
+
+# --- Ratings ---
+# Un voto por usuario; rating_sum/rating_count del recetario o receta se ajustan
+# con UPDATE atómico en la misma transacción que el voto.
+def _rating_target(target: str):
+    if target == "recipe":
+        return models.Recipe, models.Rating.recipe_id, "recipe_id"
+    return models.Cookbook, models.Rating.cookbook_id, "cookbook_id"
+
+def _adjust_rating_aggregate(db: Session, model, target_id: int, delta_sum: int, delta_count: int):
+    db.query(model).filter(model.id == target_id).update(
+        {
+            model.rating_sum: model.rating_sum + delta_sum,
+            model.rating_count: model.rating_count + delta_count,
+        },
+        synchronize_session=False,
+    )
+
+def get_user_rating(db: Session, target: str, target_id: int, user_id: int):
+    _, column, _ = _rating_target(target)
+    return db.query(models.Rating).filter(models.Rating.user_id == user_id, column == target_id).first()
+
+def rate(db: Session, target: str, target_id: int, user_id: int, score: int):
+    """Crea o cambia el voto del usuario. Puede lanzar IntegrityError si hay una carrera."""
+    model, column, field = _rating_target(target)
+    rating = db.query(models.Rating).filter(
+        models.Rating.user_id == user_id, column == target_id
+    ).with_for_update().first()
+    now = datetime.datetime.utcnow()
+    epoch = leaderboard.cached_epoch(db)
+    trend_delta = score * leaderboard.trend_weight(now, epoch)
+    if rating:
+        delta_sum, delta_count = score - rating.score, 0
+        # El voto cambiado cuenta como actividad nueva para "trending"
+        if rating.created_at:
+            trend_delta -= rating.score * leaderboard.trend_weight(rating.created_at, epoch)
+        rating.score = score
+        rating.created_at = now
+    else:
+        rating = models.Rating(score=score, user_id=user_id, created_at=now, **{field: target_id})
+        db.add(rating)
+        delta_sum, delta_count = score, 1
+    db.flush()
+    _adjust_rating_aggregate(db, model, target_id, delta_sum, delta_count)
+    leaderboard.add_contribution(db, target, target_id, trend_delta, epoch)
+    db.commit()
+    _invalidate_rating_target(db, target, target_id)
+    db.refresh(rating)
+    return rating
+
+def unrate(db: Session, target: str, target_id: int, user_id: int):
+    model, column, _ = _rating_target(target)
+    rating = db.query(models.Rating).filter(
+        models.Rating.user_id == user_id, column == target_id
+    ).with_for_update().first()
+    if rating:
+        _adjust_rating_aggregate(db, model, target_id, -rating.score, -1)
+        if rating.created_at:  # Votos sin fecha no cuentan para "trending" (ver rebuild_trend_range)
+            epoch = leaderboard.cached_epoch(db)
+            leaderboard.add_contribution(
+                db, target, target_id, -rating.score * leaderboard.trend_weight(rating.created_at, epoch), epoch,
+            )
+        db.delete(rating)
+        db.commit()
+        _invalidate_rating_target(db, target, target_id)
+    return rating
+
+def _invalidate_rating_target(db: Session, target: str, target_id: int):
+    # Los agregados de una receta también aparecen en el documento de su recetario
+    if target == "recipe":
+        invalidate_documents([target_id], get_recipe_cookbook_ids(db, [target_id]))
+    else:
+        invalidate_documents(cookbook_ids=[target_id])
+
+def get_rating_summary(db: Session, target: str, target_id: int):
+    model, _, _ = _rating_target(target)
+    return db.query(model.rating_count, model.rating_average.label("rating_average")).filter(
+        model.id == target_id
+    ).first()
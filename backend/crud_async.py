@@ -0,0 +1,71 @@
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import crud
+
+# Versiones async de las funciones de crud que usan los endpoints de lectura.
+# Con AsyncSession (DB_ASYNC=1) la función sync se ejecuta vía run_sync: el I/O
+# pasa por asyncpg/aiosqlite sin ocupar un hilo del threadpool. Con Session
+# se delega al threadpool, igual que un endpoint sync.
+
+
+async def run(db, fn, *args, **kwargs):
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(fn, *args, **kwargs)
+
+
+async def get_recipe_version(db, recipe_id: int):
+    return await run(db, crud.get_recipe_version, recipe_id)
+
+
+async def get_cookbook_version(db, cookbook_id: int):
+    return await run(db, crud.get_cookbook_version, cookbook_id)
+
+
+async def get_list_version(db, name: str):
+    return await run(db, crud.get_list_version, name)
+
+
+async def get_recipe_document(db, recipe_id: int, version):
+    return await run(db, crud.get_recipe_document, recipe_id, version)
+
+
+async def get_cookbook_document(db, cookbook_id: int, version):
+    return await run(db, crud.get_cookbook_document, cookbook_id, version)
+
+
+async def get_recipes(db, **kwargs):
+    return await run(db, crud.get_recipes, **kwargs)
+
+
+async def get_recipes_page(db, **kwargs):
+    return await run(db, crud.get_recipes_page, **kwargs)
+
+
+async def get_recipe_rows(db, **kwargs):
+    return await run(db, crud.get_recipe_rows, **kwargs)
+
+
+async def get_recipe_rows_page(db, **kwargs):
+    return await run(db, crud.get_recipe_rows_page, **kwargs)
+
+
+async def get_cookbooks(db, **kwargs):
+    return await run(db, crud.get_cookbooks, **kwargs)
+
+
+async def get_cookbooks_page(db, **kwargs):
+    return await run(db, crud.get_cookbooks_page, **kwargs)
+
+
+async def get_cookbook_rows(db, **kwargs):
+    return await run(db, crud.get_cookbook_rows, **kwargs)
+
+
+async def get_cookbook_rows_page(db, **kwargs):
+    return await run(db, crud.get_cookbook_rows_page, **kwargs)
+
+
+async def summarize_cookbooks(db, cookbooks):
+    return await run(db, crud.summarize_cookbooks, cookbooks)
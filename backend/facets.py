@@ -0,0 +1,125 @@
+import os
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, insert, literal, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from services.cache import TTLCache
+
+# Conteos por país, tipo y dificultad en una tabla agregada (recipe_facets),
+# actualizada de forma incremental por crud en la misma transacción.
+FACET_FIELDS = ("country", "type", "difficulty")
+FACETS_CACHE_TTL_SECONDS = float(os.getenv("FACETS_CACHE_TTL_SECONDS", 30))
+
+_cache = TTLCache(maxsize=1, ttl=FACETS_CACHE_TTL_SECONDS)
+_CACHE_KEY = "facets"
+
+
+def _value(value: Optional[str]) -> Optional[str]:
+    # "" o solo espacios no es un valor de faceta (formularios con el campo vacío)
+    if value is None or not str(value).strip():
+        return None
+    return value
+
+
+def facet_values(recipe) -> Dict[str, Optional[str]]:
+    """Valores de faceta de una receta (ORM o dict). Los vacíos quedan como None."""
+    if isinstance(recipe, dict):
+        return {field: _value(recipe.get(field)) for field in FACET_FIELDS}
+    return {field: _value(getattr(recipe, field, None)) for field in FACET_FIELDS}
+
+
+def _add(db: Session, facet: str, value: str, delta: int):
+    table = models.RecipeFacet.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table).values(facet=facet, value=value, count=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.facet, table.c.value],
+            set_={"count": table.c.count + delta},
+        )
+        db.execute(stmt)
+        return
+    updated = db.query(models.RecipeFacet).filter(
+        models.RecipeFacet.facet == facet, models.RecipeFacet.value == value
+    ).update({models.RecipeFacet.count: models.RecipeFacet.count + delta}, synchronize_session=False)
+    if not updated:
+        db.add(models.RecipeFacet(facet=facet, value=value, count=delta))
+
+
+def apply_change(db: Session, old: Optional[Dict[str, Optional[str]]], new: Optional[Dict[str, Optional[str]]]):
+    """
+    Ajusta los conteos por el cambio old -> new (None = receta inexistente).
+    No hace commit: se llama dentro de la transacción de crud.
+    """
+    for field in FACET_FIELDS:
+        old_value = _value(old.get(field)) if old else None
+        new_value = _value(new.get(field)) if new else None
+        if old_value == new_value:
+            continue
+        if old_value is not None:
+            _add(db, field, old_value, -1)
+        if new_value is not None:
+            _add(db, field, new_value, 1)
+
+
+def apply_counts(db: Session, recipes):
+    """Suma en bloque las facetas de recetas nuevas (un upsert por valor distinto). No hace commit."""
+    deltas = Counter()
+    for recipe in recipes:
+        for field, value in facet_values(recipe).items():
+            if value is not None:
+                deltas[(field, value)] += 1
+    for (field, value), delta in deltas.items():
+        _add(db, field, value, delta)
+
+
+def invalidate():
+    _cache.delete(_CACHE_KEY)
+
+
+def get_facets(db: Session) -> Dict[str, Dict[str, int]]:
+    """{facet: {valor: cantidad}} desde la caché en proceso o la tabla agregada."""
+    cached = _cache.get(_CACHE_KEY)
+    if cached is not None:
+        return cached
+    result = {field: {} for field in FACET_FIELDS}
+    query = (
+        db.query(models.RecipeFacet.facet, models.RecipeFacet.value, models.RecipeFacet.count)
+        .filter(models.RecipeFacet.count > 0)
+        .order_by(models.RecipeFacet.facet, models.RecipeFacet.value)
+    )
+    # Solo lectura: la tabla la llena la migración 0011 y la mantiene crud
+    for facet, value, count in query.all():
+        if _value(value) is None:
+            continue  # Filas vacías guardadas antes de filtrarlas
+        result.setdefault(facet, {})[value] = count
+    _cache.set(_CACHE_KEY, result)
+    return result
+
+
+def rebuild(conn):
+    """
+    Recalcula la tabla completa desde recipes (migración 0011 o reparación).
+    No hace commit: todo va en la transacción de `conn`.
+    """
+    recipes = models.Recipe.__table__
+    table = models.RecipeFacet.__table__
+    if conn.dialect.name == "postgresql":
+        # Las escrituras de crud esperan en su upsert de facetas y suman su
+        # cambio después del commit, sobre los conteos recalculados
+        conn.execute(text("LOCK TABLE recipe_facets IN EXCLUSIVE MODE"))
+    conn.execute(delete(table))
+    for field in FACET_FIELDS:
+        column = recipes.c[field]
+        conn.execute(insert(table).from_select(
+            ["facet", "value", "count"],
+            select(literal(field), column, func.count(recipes.c.id))
+            .where(column.isnot(None), func.trim(column) != "")
+            .group_by(column),
+        ))
+    invalidate()
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import time
+
+from fastapi import Request, Response
+
+# ETags débiles a partir de versiones de fila (updated_at) y Cache-Control para
+# que el navegador revalide (304) y un CDN pueda servir desde su caché.
+HTTP_CACHE_S_MAXAGE = int(os.getenv("HTTP_CACHE_S_MAXAGE", 60))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", 30))
+# Los votos no cambian la versión de los listados (crud.list_versions): el ETag
+# del listado cambia además cada LIST_ETAG_WINDOW_SECONDS para que los
+# promedios de rating se vean con ese retraso como máximo
+LIST_ETAG_WINDOW_SECONDS = int(os.getenv("LIST_ETAG_WINDOW_SECONDS", 60))
+
+CACHE_CONTROL = (
+    f"public, max-age=0, s-maxage={HTTP_CACHE_S_MAXAGE}, "
+    f"stale-while-revalidate={HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+)
+
+
+def make_etag(*parts) -> str:
+    """ETag débil estable para las partes dadas (ids, versiones, parámetros)."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def list_window() -> int:
+    return int(time.time() // LIST_ETAG_WINDOW_SECONDS)
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Comparación débil contra If-None-Match (admite lista y '*')."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = _opaque(etag)
+    return any(_opaque(tag) == current for tag in header.split(","))
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def set_cache_headers(response: Response, etag: str):
+    response.headers.update(cache_headers(etag))
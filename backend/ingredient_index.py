@@ -0,0 +1,112 @@
+import re
+import unicodedata
+from typing import Iterable, List, Set
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+import models
+
+# Índice invertido de ingredientes: cada receta aporta claves normalizadas
+# (nombre completo y cada palabra significativa), sin acentos ni mayúsculas.
+STOPWORDS = {"de", "del", "la", "el", "las", "los", "y", "con", "en", "al", "a", "para", "o"}
+MIN_WORD_LENGTH = 3
+
+
+def normalize_name(name: str) -> str:
+    """'  Limones  Verdes ' -> 'limon verde'. Cada palabra se lleva a singular (ver _singular)."""
+    words = re.findall(r"\w+", unicodedata.normalize("NFC", name or "").casefold(), re.UNICODE)
+    return " ".join(_strip_accents(_singular(w)) for w in words)
+
+
+def _strip_accents(word: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", word)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+# Plurales en -es, antes de quitar los acentos (la tilde distingue ajíes de
+# especies): ajíes -> ají, nueces -> nuez, limones -> limon, panes -> pan,
+# flores -> flor, frijoles -> frijol. -ces solo pasa a z tras vocal (dulces es
+# dulce + s) y "-iles" queda fuera: chiles es chile + s, no chil + es.
+_PLURAL_ES = [
+    (re.compile(r"íes$"), "í"),
+    (re.compile(r"([aeiouáéíóú])ces$"), r"\1z"),
+    (re.compile(r"([aeou]l|[aeiou][nr])es$"), r"\1"),
+]
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4:
+        for pattern, replacement in _PLURAL_ES:
+            singular, count = pattern.subn(replacement, word)
+            if count:
+                return singular
+    if len(word) > 3 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def index_keys(ingredients) -> Set[str]:
+    """Claves a indexar para una lista de ingredientes ({name, amount, unit})."""
+    keys = set()
+    for ing in ingredients or []:
+        name = ing.get("name") if isinstance(ing, dict) else getattr(ing, "name", None)
+        normalized = normalize_name(name)
+        if not normalized:
+            continue
+        keys.add(normalized)
+        for word in normalized.split():
+            if len(word) >= MIN_WORD_LENGTH and word not in STOPWORDS:
+                keys.add(word)
+    return keys
+
+
+def query_terms(names: Iterable[str]) -> List[Set[str]]:
+    """
+    Claves de cada ingrediente de una consulta, con index_keys (nombre completo
+    y cada palabra): "pimiento rojo" encuentra "pimientos rojos asados". Sin
+    términos vacíos ni repetidos, en orden.
+    """
+    terms = {}
+    for name in names:
+        keys = index_keys([{"name": name}])
+        if keys:
+            terms.setdefault(normalize_name(name), keys)
+    return list(terms.values())
+
+
+def sync_recipe(db: Session, recipe_id: int, ingredients):
+    """Reemplaza las claves de una receta. No hace commit: va en la misma transacción."""
+    db.query(models.RecipeIngredient).filter(
+        models.RecipeIngredient.recipe_id == recipe_id
+    ).delete(synchronize_session=False)
+    keys = index_keys(ingredients)
+    if keys:
+        db.bulk_insert_mappings(
+            models.RecipeIngredient,
+            [{"recipe_id": recipe_id, "name": key} for key in keys],
+        )
+
+
+def backfill_range(conn, start: int, end: int):
+    """
+    Reconstruye las claves de las recetas con start <= id < end, con un DELETE
+    y un INSERT por lote. Paso de Migrator.backfill: no hace commit.
+    """
+    recipes = models.Recipe.__table__
+    keys_table = models.RecipeIngredient.__table__
+    # Bloquea las recetas del lote: un update_recipe concurrente espera y
+    # escribe sus claves después, sobre las de este lote
+    rows = conn.execute(
+        select(recipes.c.id, recipes.c.ingredients)
+        .where(recipes.c.id >= start, recipes.c.id < end)
+        .with_for_update()
+    ).all()
+    conn.execute(delete(keys_table).where(keys_table.c.recipe_id >= start, keys_table.c.recipe_id < end))
+    keys = [
+        {"recipe_id": recipe_id, "name": key}
+        for recipe_id, ingredients in rows
+        for key in index_keys(ingredients)
+    ]
+    if keys:
+        conn.execute(insert(keys_table), keys)
@@ -0,0 +1,318 @@
+import datetime
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# "Trending": cada voto aporta score * 2^((t - EPOCH) / HALF_LIFE) al trend_score
+# de su receta/recetario, y cada receta/recetario nuevo aporta CREATION_BOOST en
+# su created_at. Como el factor de decaimiento actual es el mismo para todos,
+# ordenar por trend_score equivale a ordenar por el puntaje decaído a "ahora":
+# el ranking es un index scan, sin recorrer la tabla de ratings.
+#
+# 2^x desborda un float pasadas 1024 vidas medias desde EPOCH, así que la época
+# vive en la tabla trend_epoch y se mueve hacia adelante: rescale() multiplica
+# todos los trend_score por 2^-x en la misma transacción (el orden no cambia).
+#
+# Votos y altas no bloquean trend_epoch: calculan con la época en caché del
+# proceso y, después de escribir, la vuelven a leer sin lock (confirm_epoch).
+# Si rescale() la movió, corrigen su propia escritura. rescale() toma recipes y
+# cookbooks en modo SHARE: espera a las escrituras en curso (que reescala) y
+# las siguientes esperan su commit (y leen la época nueva).
+TREND_EPOCH = datetime.datetime(2024, 1, 1)  # Época inicial, antes de trend_epoch
+TREND_HALF_LIFE_HOURS = float(os.getenv("TREND_HALF_LIFE_HOURS", 7 * 24))
+# Vidas medias transcurridas desde la época antes de reescalar (el job periódico)
+TREND_RESCALE_HALF_LIVES = float(os.getenv("TREND_RESCALE_HALF_LIVES", 512))
+TREND_CREATION_BOOST = float(os.getenv("TREND_CREATION_BOOST", 3))
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 200))
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", 60))
+# Clave de pg_try_advisory_xact_lock: un solo worker recalcula el snapshot por vez
+LEADERBOARD_LOCK_KEY = 0x7472656E64  # "trend"
+
+KINDS = ("recipe", "cookbook")
+
+_epoch_lock = threading.Lock()
+_cached_epoch: Optional[datetime.datetime] = None
+
+
+def _models_for(kind: str):
+    return models.Recipe if kind == "recipe" else models.Cookbook
+
+
+def _half_lives(at: Optional[datetime.datetime], epoch: datetime.datetime) -> float:
+    at = at or datetime.datetime.utcnow()
+    return (at - epoch).total_seconds() / 3600.0 / TREND_HALF_LIFE_HOURS
+
+
+def trend_weight(at: Optional[datetime.datetime], epoch: datetime.datetime) -> float:
+    """Peso de un evento ocurrido en `at` (None: ahora), relativo a `epoch`."""
+    return math.pow(2.0, _half_lives(at, epoch))
+
+
+def decay_to_now(trend_score: float, epoch: datetime.datetime, now: Optional[datetime.datetime] = None) -> float:
+    """Convierte un trend_score acumulado al puntaje decaído en `now`."""
+    return (trend_score or 0.0) * math.pow(2.0, -_half_lives(now, epoch))
+
+
+def current_epoch(db: Session, for_update: bool = False) -> datetime.datetime:
+    """
+    Época vigente de los trend_score, leída de la tabla. Con for_update bloquea
+    la fila hasta el fin de la transacción (rescale); si no, el lock es
+    compartido (recálculos por lote, que no deben cruzarse con un rescale).
+    """
+    row = (
+        db.query(models.TrendEpoch.epoch)
+        .filter(models.TrendEpoch.id == 1)
+        .with_for_update(read=not for_update)
+        .first()
+    )
+    return _remember(row.epoch if row else TREND_EPOCH)
+
+
+def _remember(epoch: datetime.datetime) -> datetime.datetime:
+    global _cached_epoch
+    with _epoch_lock:
+        _cached_epoch = epoch
+    return epoch
+
+
+def confirm_epoch(db: Session) -> datetime.datetime:
+    """Época vigente sin lock (después de escribir); actualiza la caché."""
+    epoch = db.query(models.TrendEpoch.epoch).filter(models.TrendEpoch.id == 1).scalar()
+    return _remember(epoch or TREND_EPOCH)
+
+
+def cached_epoch(db: Session) -> datetime.datetime:
+    """Época en caché del proceso; se lee (sin lock) solo la primera vez."""
+    with _epoch_lock:
+        epoch = _cached_epoch
+    return epoch if epoch is not None else confirm_epoch(db)
+
+
+def creation_score(epoch: datetime.datetime) -> float:
+    """trend_score inicial de una receta/recetario creado ahora, relativo a `epoch`."""
+    return TREND_CREATION_BOOST * trend_weight(None, epoch)
+
+
+def settle_created(db: Session, kind: str, ids, epoch: datetime.datetime):
+    """
+    Después de insertar filas con creation_score(epoch): si rescale() movió la
+    época, las convierte a la nueva. No hace commit.
+    """
+    current = confirm_epoch(db)
+    if current != epoch and ids:
+        model = _models_for(kind)
+        db.query(model).filter(model.id.in_(ids)).update(
+            {model.trend_score: model.trend_score * trend_weight(epoch, current)},
+            synchronize_session=False,
+        )
+
+
+def add_contribution(db: Session, kind: str, target_id: int, amount: float, epoch: datetime.datetime):
+    """Suma (o resta) una contribución calculada con `epoch` al trend_score. No hace commit."""
+    model = _models_for(kind)
+    query = db.query(model).filter(model.id == target_id)
+    query.update({model.trend_score: model.trend_score + amount}, synchronize_session=False)
+    current = confirm_epoch(db)
+    if current != epoch:
+        # rescale() ya había convertido la fila: la contribución pasa a la época nueva
+        correction = amount * (trend_weight(epoch, current) - 1.0)
+        query.update({model.trend_score: model.trend_score + correction}, synchronize_session=False)
+
+
+def rescale(db: Session, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    """
+    Mueve la época a `now` y reescala todos los trend_score en la misma
+    transacción. No hace commit.
+    """
+    now = now or datetime.datetime.utcnow()
+    if db.get_bind().dialect.name == "postgresql":
+        # Espera a las escrituras en curso y detiene las nuevas hasta el commit
+        db.execute(text("LOCK TABLE recipes, cookbooks IN SHARE MODE"))
+    epoch = current_epoch(db, for_update=True)
+    # Puede quedar en 0.0 para puntajes muy viejos: ya no cuentan para el ranking
+    factor = math.pow(2.0, -_half_lives(now, epoch))
+    for kind in KINDS:
+        model = _models_for(kind)
+        db.query(model).update({model.trend_score: model.trend_score * factor}, synchronize_session=False)
+    updated = db.query(models.TrendEpoch).filter(models.TrendEpoch.id == 1).update(
+        {models.TrendEpoch.epoch: now}, synchronize_session=False
+    )
+    if not updated:
+        db.add(models.TrendEpoch(id=1, epoch=now))
+    db.flush()
+    return _remember(now)
+
+
+def rebuild_trend_range(db: Session, kind: str, start: int, end: int):
+    """
+    Recalcula desde cero el trend_score de las recetas/recetarios con
+    start <= id < end. Las filas quedan bloqueadas, así que un voto concurrente
+    espera y suma su contribución sobre el valor nuevo. Eventos sin fecha no
+    cuentan. No hace commit.
+    """
+    model = _models_for(kind)
+    column = models.Rating.recipe_id if kind == "recipe" else models.Rating.cookbook_id
+    epoch = current_epoch(db)
+    targets = (
+        db.query(model.id, model.created_at)
+        .filter(model.id >= start, model.id < end)
+        .with_for_update()
+        .all()
+    )
+    totals: Dict[int, float] = {
+        target_id: TREND_CREATION_BOOST * trend_weight(created_at, epoch) if created_at else 0.0
+        for target_id, created_at in targets
+    }
+    ratings = db.query(column, models.Rating.score, models.Rating.created_at).filter(column >= start, column < end)
+    for target_id, score, created_at in ratings:
+        if target_id in totals and created_at:
+            totals[target_id] += (score or 0) * trend_weight(created_at, epoch)
+    db.bulk_update_mappings(model, [{"id": target_id, "trend_score": value} for target_id, value in totals.items()])
+
+
+def rebuild_trend_scores(db: Session, batch_size: int = 10000):
+    """
+    Recalcula todos los trend_score (p. ej. si cambia TREND_HALF_LIFE_HOURS),
+    un commit por lote de ids. En producción lo corre la migración 0008.
+    """
+    for kind in KINDS:
+        model = _models_for(kind)
+        low, high = db.query(func.min(model.id), func.max(model.id)).one()
+        if low is None:
+            continue
+        for start in range(low, high + 1, batch_size):
+            rebuild_trend_range(db, kind, start, start + batch_size)
+            db.commit()
+
+
+class Leaderboard:
+    """Snapshot en memoria (ordenado) del top-N por tipo, persistido en leaderboard_entries."""
+
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self.size = size
+        self._snapshot: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def compute(self, db: Session, now: Optional[datetime.datetime] = None) -> Dict[str, List[dict]]:
+        """
+        Lee el top-N por trend_score (index scan) y persiste el snapshot, en una
+        transacción. En Postgres solo un worker a la vez (advisory lock); los
+        demás cargan el snapshot que persistió ese worker.
+        """
+        now = now or datetime.datetime.utcnow()
+        if db.get_bind().dialect.name == "postgresql":
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": LEADERBOARD_LOCK_KEY}
+            ).scalar()
+            if not locked:
+                db.rollback()
+                self.load(db)
+                return self.snapshot()
+        epoch = self._maybe_rescale(db, now)
+        snapshot = {}
+        for kind in KINDS:
+            model = _models_for(kind)
+            rows = (
+                db.query(model.id, model.title, model.trend_score)
+                .filter(model.trend_score > 0)
+                .order_by(model.trend_score.desc(), model.id.desc())
+                .limit(self.size)
+                .all()
+            )
+            snapshot[kind] = [
+                {"kind": kind, "id": row.id, "title": row.title, "score": decay_to_now(row.trend_score, epoch, now)}
+                for row in rows
+            ]
+
+        db.query(models.LeaderboardEntry).delete(synchronize_session=False)
+        db.bulk_insert_mappings(
+            models.LeaderboardEntry,
+            [
+                {"kind": kind, "rank": rank, "target_id": e["id"], "title": e["title"], "score": e["score"], "computed_at": now}
+                for kind, entries in snapshot.items()
+                for rank, e in enumerate(entries)
+            ],
+        )
+        db.commit()
+
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _maybe_rescale(self, db: Session, now: datetime.datetime) -> datetime.datetime:
+        """
+        Reescala si pasaron TREND_RESCALE_HALF_LIVES desde la época. Devuelve la
+        época vigente. No hace commit: va en la transacción de compute().
+        """
+        epoch = confirm_epoch(db)
+        if _half_lives(now, epoch) >= TREND_RESCALE_HALF_LIVES:
+            epoch = rescale(db, now)
+            logger.info("Trend scores rescaled to epoch %s", epoch)
+        return epoch
+
+    def load(self, db: Session):
+        """Carga el último snapshot persistido (arranque en frío, sin recalcular)."""
+        snapshot = {kind: [] for kind in KINDS}
+        rows = db.query(models.LeaderboardEntry).order_by(
+            models.LeaderboardEntry.kind, models.LeaderboardEntry.rank
+        ).all()
+        for row in rows:
+            snapshot.setdefault(row.kind, []).append(
+                {"kind": row.kind, "id": row.target_id, "title": row.title, "score": row.score}
+            )
+        with self._lock:
+            self._snapshot = snapshot
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        with self._lock:
+            return self._snapshot
+
+    def top(self, kind: str, limit: int) -> List[dict]:
+        with self._lock:
+            return self._snapshot.get(kind, [])[:limit]
+
+    @property
+    def loaded(self) -> bool:
+        with self._lock:
+            return bool(self._snapshot)
+
+    # --- Job periódico en proceso ---
+    def _run(self, interval: float):
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                self.compute(db)
+            except Exception:
+                db.rollback()
+                logger.exception("Leaderboard refresh failed")
+            finally:
+                db.close()
+            self._stop.wait(interval)
+
+    def start(self, interval: float = LEADERBOARD_REFRESH_SECONDS):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="leaderboard", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+leaderboard = Leaderboard()
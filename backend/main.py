@@ -1,15 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import async_engine
 from fastapi.staticfiles import StaticFiles
-from routers import auth, recipes, cookbooks, upload
+from routers import auth, recipes, cookbooks, upload, metrics, leaderboard as leaderboard_router
+from leaderboard import leaderboard
+from token_revocation import revocation_list
+from services.pdf_jobs import pdf_render_service
+from services.password_hasher import password_hasher
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# El esquema se crea y actualiza con `python migrate.py` (antes de desplegar),
+# no al arrancar: cada cold start evita las consultas al catálogo.
 
 app = FastAPI(title="Recetario API")
 
@@ -35,6 +39,23 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application starting up...")
+    # Recalcula el snapshot de "trending" periódicamente en segundo plano; con
+    # varios workers escribe uno solo por vez y el resto carga ese snapshot
+    leaderboard.start()
+    # Sincroniza periódicamente las versiones de token revocadas
+    revocation_list.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    leaderboard.stop()
+    revocation_list.stop()
+    pdf_render_service.shutdown()
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 # Mount static files
@@ -50,6 +71,8 @@ app.include_router(auth.router)
 app.include_router(recipes.router)
 app.include_router(cookbooks.router)
 app.include_router(upload.router)
+app.include_router(leaderboard_router.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
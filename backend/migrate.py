@@ -0,0 +1,267 @@
+"""
+Migraciones de esquema versionadas (carpeta migrations/). Se corren como un
+comando aparte, antes de desplegar: la API no toca el esquema al arrancar.
+
+    python migrate.py               aplica las migraciones pendientes
+    python migrate.py post-deploy   también las de después del despliegue
+    python migrate.py status        lista las aplicadas y las pendientes
+
+Usa MIGRATION_DATABASE_URL si está definida (en Supabase conviene la conexión
+directa o el pooler en modo sesión, puerto 5432: el modo transacción no
+mantiene advisory locks ni SETs de sesión), si no DATABASE_URL.
+
+Cada migración es un módulo NNNN_nombre.py con una función upgrade(m) que usa
+los pasos de Migrator. Los pasos son idempotentes y los índices y backfills
+hacen commit por su cuenta, así que una migración que falla a la mitad se
+vuelve a correr entera; solo se registra en schema_migrations al terminar.
+
+Los cambios incompatibles van en dos pasos (expand/contract): la migración que
+agrega lo nuevo corre antes de desplegar, y la que quita lo viejo declara
+POST_DEPLOY = True y solo se aplica con `post-deploy`, cuando ya no queda
+ninguna instancia con el código anterior.
+"""
+import datetime
+import importlib
+import os
+import pkgutil
+import sys
+import time
+from typing import Callable, Iterable, List, Optional, Sequence, Union
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import NullPool
+
+import database
+import migrations
+
+# Tiempo máximo esperando el lock de un ALTER TABLE: si hay una transacción
+# larga, falla en vez de bloquear todas las consultas encoladas detrás
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 5000))
+# Pausa entre lotes de un backfill, para no saturar la base en producción
+MIGRATION_BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", 0.05))
+
+# Un solo proceso migrando a la vez (pg_advisory_lock)
+_ADVISORY_LOCK_KEY = 72461530
+
+_TRACKING_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+)
+"""
+
+
+class Migrator:
+    """Pasos disponibles para las migraciones, seguros con la app en línea."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def _begin(self):
+        conn = self.engine.connect()
+        transaction = conn.begin()
+        if self.is_postgres:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+        return conn, transaction
+
+    def execute(self, *statements: Union[str, Callable], **params):
+        """
+        Sentencias en una sola transacción (con lock_timeout en Postgres). Un
+        paso también puede ser una función fn(conn, **params), para lo que no
+        se puede expresar en SQL.
+        """
+        conn, transaction = self._begin()
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement(conn, **params)
+                else:
+                    conn.execute(text(statement), params)
+            transaction.commit()
+        finally:
+            conn.close()
+
+    def create_tables(self, *tables):
+        """Crea las tablas (Table de SQLAlchemy) que no existan."""
+        conn, transaction = self._begin()
+        try:
+            for table in tables:
+                table.create(conn, checkfirst=True)
+            transaction.commit()
+        finally:
+            conn.close()
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(c["name"] == column for c in inspect(self.engine).get_columns(table))
+
+    def add_column(self, table: str, column: str, ddl: str):
+        """ALTER TABLE ... ADD COLUMN si falta. En Postgres 11+ un DEFAULT constante no reescribe la tabla."""
+        if not self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+    def set_not_null(self, table: str, column: str):
+        """
+        Postgres: SET NOT NULL sin recorrer la tabla con el lock exclusivo. Un
+        CHECK NOT VALID se valida aparte (no bloquea escrituras) y Postgres 12+
+        lo usa para saltarse el recorrido. SQLite no puede cambiar la columna.
+        """
+        if not self.is_postgres:
+            return
+        if not any(c["name"] == column and c["nullable"] for c in inspect(self.engine).get_columns(table)):
+            return
+        check = f"{table}_{column}_not_null"
+        self.execute(
+            f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}",
+            f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID",
+        )
+        self.execute("SET LOCAL statement_timeout = 0", f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+        self.execute(
+            f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+            f"ALTER TABLE {table} DROP CONSTRAINT {check}",
+        )
+
+    def create_index(self, name: str, table: str, columns: Union[str, Sequence[str]],
+                     unique: bool = False, using: Optional[str] = None):
+        """
+        Postgres: CREATE INDEX CONCURRENTLY (fuera de transacción, sin bloquear
+        escrituras). Un intento fallido deja el índice INVALID: se borra y se
+        vuelve a construir. SQLite: CREATE INDEX normal.
+        """
+        if not isinstance(columns, str):
+            columns = ", ".join(columns)
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        if not self.is_postgres:
+            self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})")
+            return
+        method = f" USING {using}" if using else ""
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # Construir un índice grande puede superar el statement_timeout del rol
+            conn.execute(text("SET statement_timeout = 0"))
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table}{method} ({columns})"))
+
+    def backfill(self, table: str, statements: Iterable[Union[str, Callable]],
+                 batch_size: int = MIGRATION_BATCH_SIZE, key: str = "id"):
+        """
+        Ejecuta `statements` por rangos de `key` (:start <= key < :end), un
+        commit por lote: sin transacciones largas ni locks sobre toda la tabla.
+        Las funciones reciben fn(conn, start=..., end=...).
+        """
+        statements = list(statements)
+        with self.engine.connect() as conn:
+            low, high = conn.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+        if low is None:
+            return
+        start = low
+        while start <= high:
+            end = start + batch_size
+            self.execute(*statements, start=start, end=end)
+            print(f"  {table}: {key} < {end} ({min(end - low, high - low + 1)}/{high - low + 1})")
+            start = end
+            if MIGRATION_BATCH_PAUSE:
+                time.sleep(MIGRATION_BATCH_PAUSE)
+
+
+def available() -> List[tuple]:
+    """[(version, name, módulo)] de migrations/, en orden de versión."""
+    found = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        version, _, name = info.name.partition("_")
+        if version.isdigit():
+            found.append((version, name, importlib.import_module(f"migrations.{info.name}")))
+    return sorted(found, key=lambda item: item[0])
+
+
+def applied(engine) -> dict:
+    with engine.begin() as conn:
+        conn.execute(text(_TRACKING_DDL))
+        return {row.version: row.applied_at for row in conn.execute(text("SELECT version, applied_at FROM schema_migrations"))}
+
+
+def create_migration_engine(url: str = None):
+    url = url or os.getenv("MIGRATION_DATABASE_URL") or database.SQLALCHEMY_DATABASE_URL
+    return create_engine(url, poolclass=NullPool)
+
+
+def is_post_deploy(module) -> bool:
+    return getattr(module, "POST_DEPLOY", False)
+
+
+def upgrade(url: str = None, post_deploy: bool = False) -> int:
+    """
+    Aplica las migraciones pendientes en orden. Las POST_DEPLOY se saltan salvo
+    con post_deploy=True. Devuelve cuántas se aplicaron.
+    """
+    engine = create_migration_engine(url)
+    lock = None
+    if engine.dialect.name == "postgresql":
+        lock = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    try:
+        done = applied(engine)
+        migrator = Migrator(engine)
+        count = 0
+        for version, name, module in available():
+            if version in done:
+                continue
+            if is_post_deploy(module) and not post_deploy:
+                print(f"Skipping {version} {name} (post-deploy: run 'python migrate.py post-deploy' once the new code is live)")
+                continue
+            print(f"Applying {version} {name}...")
+            started = time.perf_counter()
+            module.upgrade(migrator)
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :at)"),
+                    {"version": version, "name": name, "at": datetime.datetime.utcnow()},
+                )
+            print(f"Applied {version} {name} in {time.perf_counter() - started:.1f}s")
+            count += 1
+        if not count:
+            print("Schema is up to date.")
+        return count
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            lock.close()
+        engine.dispose()
+
+
+def status(url: str = None):
+    engine = create_migration_engine(url)
+    try:
+        done = applied(engine)
+        for version, name, module in available():
+            if version in done:
+                state = f"applied {done[version]}"
+            else:
+                state = "pending (post-deploy)" if is_post_deploy(module) else "pending"
+            print(f"{version}  {name:<32} {state}")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        upgrade()
+    elif command == "post-deploy":
+        upgrade(post_deploy=True)
+    elif command == "status":
+        status()
+    else:
+        sys.exit(f"Unknown command: {command} (use upgrade, post-deploy or status)")
@@ -0,0 +1,152 @@
+"""
+Esquema base: las tablas e índices que creaban create_all y schema.sql.
+Idempotente: en una base existente solo agrega lo que falte (columnas que
+antes se agregaban con ALTER TABLE a mano, índices).
+
+Las tablas están copiadas aquí a propósito y no importan models.py: una
+migración describe el esquema de su versión, aunque los modelos cambien después.
+"""
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, JSON, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+users = Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String),
+    Column("email", String),
+    Column("hashed_password", String),
+    Column("token_version", Integer, nullable=False, server_default="0"),
+    Column("tokens_revoked_at", DateTime),
+)
+
+cookbooks = Table(
+    "cookbooks", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String),
+    Column("description", String),
+    Column("pdf_url", String),
+    Column("pdf_hash", String),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+    Column("rating_sum", Integer, nullable=False, server_default="0"),
+    Column("rating_count", Integer, nullable=False, server_default="0"),
+    Column("trend_score", Float, nullable=False, server_default="0"),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+
+recipes = Table(
+    "recipes", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String),
+    Column("ingredients", JSON),
+    Column("instructions", Text),
+    Column("instructions_format", String),
+    Column("country", String),
+    Column("type", String),
+    Column("image_url", String),
+    Column("preparation_time_minutes", Integer),
+    Column("difficulty", String),
+    Column("notes", Text),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+    Column("cookbook_id", Integer, ForeignKey("cookbooks.id")),
+    Column("rating_sum", Integer, nullable=False, server_default="0"),
+    Column("rating_count", Integer, nullable=False, server_default="0"),
+    Column("trend_score", Float, nullable=False, server_default="0"),
+)
+
+recipe_ingredients = Table(
+    "recipe_ingredients", metadata,
+    Column("recipe_id", Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True),
+    Column("name", String, primary_key=True),
+)
+
+recipe_facets = Table(
+    "recipe_facets", metadata,
+    Column("facet", String, primary_key=True),
+    Column("value", String, primary_key=True),
+    Column("count", Integer, nullable=False, server_default="0"),
+)
+
+ratings = Table(
+    "ratings", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("score", Integer),
+    Column("created_at", DateTime),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("recipe_id", Integer, ForeignKey("recipes.id")),
+    Column("cookbook_id", Integer, ForeignKey("cookbooks.id")),
+)
+
+refresh_tokens = Table(
+    "refresh_tokens", metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("token_version", Integer, nullable=False),
+    Column("created_at", DateTime),
+    Column("expires_at", DateTime, nullable=False),
+    Column("revoked_at", DateTime),
+)
+
+leaderboard_entries = Table(
+    "leaderboard_entries", metadata,
+    Column("kind", String, primary_key=True),
+    Column("rank", Integer, primary_key=True),
+    Column("target_id", Integer, nullable=False),
+    Column("title", String),
+    Column("score", Float, nullable=False),
+    Column("computed_at", DateTime, nullable=False),
+)
+
+# Columnas agregadas después de crear las tablas en bases ya desplegadas
+ADDED_COLUMNS = [
+    ("users", "token_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "tokens_revoked_at", "TIMESTAMP"),
+    ("cookbooks", "pdf_hash", "VARCHAR"),
+    ("cookbooks", "rating_sum", "INTEGER NOT NULL DEFAULT 0"),
+    ("cookbooks", "rating_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("cookbooks", "trend_score", "FLOAT NOT NULL DEFAULT 0"),
+    ("cookbooks", "created_at", "TIMESTAMP"),
+    ("cookbooks", "updated_at", "TIMESTAMP"),
+    ("recipes", "preparation_time_minutes", "INTEGER DEFAULT 0"),
+    ("recipes", "difficulty", "VARCHAR DEFAULT 'medium'"),
+    ("recipes", "notes", "TEXT"),
+    ("recipes", "rating_sum", "INTEGER NOT NULL DEFAULT 0"),
+    ("recipes", "rating_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("recipes", "trend_score", "FLOAT NOT NULL DEFAULT 0"),
+    ("recipes", "created_at", "TIMESTAMP"),
+    ("recipes", "updated_at", "TIMESTAMP"),
+    ("ratings", "created_at", "TIMESTAMP"),
+]
+
+# (nombre, tabla, columnas, unique)
+INDEXES = [
+    ("ix_users_id", "users", "id", False),
+    ("ix_users_username", "users", "username", True),
+    ("ix_users_email", "users", "email", True),
+    ("ix_users_tokens_revoked_at", "users", "tokens_revoked_at", False),
+    ("ix_cookbooks_id", "cookbooks", "id", False),
+    ("ix_cookbooks_title", "cookbooks", "title", False),
+    ("ix_cookbooks_created_at_id", "cookbooks", "created_at, id", False),
+    ("ix_cookbooks_trend_score", "cookbooks", "trend_score", False),
+    ("ix_recipes_id", "recipes", "id", False),
+    ("ix_recipes_title", "recipes", "title", False),
+    ("ix_recipes_created_at_id", "recipes", "created_at, id", False),
+    ("ix_recipes_trend_score", "recipes", "trend_score", False),
+    ("ix_recipe_ingredients_name_recipe", "recipe_ingredients", "name, recipe_id", False),
+    ("ix_ratings_id", "ratings", "id", False),
+    # Un voto por usuario (los NULL no colisionan: cada fila es de receta o de recetario)
+    ("uq_ratings_user_recipe", "ratings", "user_id, recipe_id", True),
+    ("uq_ratings_user_cookbook", "ratings", "user_id, cookbook_id", True),
+    ("ix_refresh_tokens_user_id", "refresh_tokens", "user_id", False),
+]
+
+
+def upgrade(m):
+    m.create_tables(*metadata.sorted_tables)
+    for table, column, ddl in ADDED_COLUMNS:
+        m.add_column(table, column, ddl)
+    for name, table, columns, unique in INDEXES:
+        m.create_index(name, table, columns, unique=unique)
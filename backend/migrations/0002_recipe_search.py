@@ -0,0 +1,60 @@
+"""
+Índices de búsqueda full-text (antes search.install al arrancar la API).
+- Postgres: columna tsvector generada (diccionario español) con índice GIN,
+  más trigramas sobre el título. Agregar la columna generada reescribe la
+  tabla una vez; en las bases ya desplegadas existe y no se toca.
+- SQLite: tabla virtual FTS5 mantenida por triggers, llenada por lotes.
+"""
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE recipes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(jsonb_path_query_array(ingredients::jsonb, '$[*].name')::text, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(notes, '')), 'C') ||
+        setweight(to_tsvector('spanish', coalesce(instructions, '')), 'D')
+    ) STORED
+    """,
+]
+
+_SQLITE_INGREDIENT_NAMES = "(SELECT group_concat(json_extract(value, '$.name'), ' ') FROM json_each({row}.ingredients))"
+_SQLITE_INSERT_ROW = (
+    "INSERT INTO recipes_fts(rowid, title, ingredients, notes, instructions) "
+    "VALUES ({row}.id, {row}.title, " + _SQLITE_INGREDIENT_NAMES + ", {row}.notes, {row}.instructions);"
+)
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        title, ingredients, notes, instructions,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    "CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN "
+    + _SQLITE_INSERT_ROW.format(row="NEW") + " END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN "
+    "DELETE FROM recipes_fts WHERE rowid = OLD.id; END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE OF title, ingredients, notes, instructions ON recipes BEGIN "
+    "DELETE FROM recipes_fts WHERE rowid = OLD.id; "
+    + _SQLITE_INSERT_ROW.format(row="NEW") + " END",
+]
+
+# Indexa recetas que existían antes de crear la tabla FTS
+SQLITE_FILL = (
+    "INSERT INTO recipes_fts(rowid, title, ingredients, notes, instructions) "
+    "SELECT recipes.id, recipes.title, " + _SQLITE_INGREDIENT_NAMES.format(row="recipes")
+    + ", recipes.notes, recipes.instructions FROM recipes "
+    "WHERE recipes.id >= :start AND recipes.id < :end "
+    "AND recipes.id NOT IN (SELECT rowid FROM recipes_fts)"
+)
+
+
+def upgrade(m):
+    if m.is_postgres:
+        m.execute(*POSTGRES_DDL)
+        m.create_index("ix_recipes_search_vector", "recipes", "search_vector", using="GIN")
+        m.create_index("ix_recipes_title_trgm", "recipes", "title gin_trgm_ops", using="GIN")
+    else:
+        m.execute(*SQLITE_DDL)
+        m.backfill("recipes", [SQLITE_FILL])
@@ -0,0 +1,45 @@
+"""
+Pertenencia ordenada receta/recetario en cookbook_recipes, copiada por lotes
+desde recipes.cookbook_id. position toma el id de la receta (el orden en que se
+mostraban): los huecos no importan y cada lote se puede calcular por separado.
+
+Paso "expand": solo copia. Mientras dura el despliegue las instancias viejas
+siguen leyendo y escribiendo recipes.cookbook_id, así que la columna no se toca
+aquí; la vacía 0005 (post-deploy).
+"""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table
+
+metadata = MetaData()
+
+# Solo para resolver las FKs de cookbook_recipes
+Table("cookbooks", metadata, Column("id", Integer, primary_key=True))
+Table("recipes", metadata, Column("id", Integer, primary_key=True))
+
+cookbook_recipes = Table(
+    "cookbook_recipes", metadata,
+    Column("cookbook_id", Integer, ForeignKey("cookbooks.id", ondelete="CASCADE"), primary_key=True),
+    Column("recipe_id", Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True),
+    Column("position", Integer, nullable=False),
+)
+
+COPY_BATCH = [
+    """
+    INSERT INTO cookbook_recipes (cookbook_id, recipe_id, position)
+    SELECT r.cookbook_id, r.id, r.id
+    FROM recipes r
+    WHERE r.id >= :start AND r.id < :end
+      AND r.cookbook_id IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM cookbook_recipes cr
+          WHERE cr.cookbook_id = r.cookbook_id AND cr.recipe_id = r.id
+      )
+    """,
+]
+
+
+def upgrade(m):
+    m.create_tables(cookbook_recipes)
+    m.create_index("ix_cookbook_recipes_cookbook_position", "cookbook_recipes", "cookbook_id, position, recipe_id")
+    m.create_index("ix_cookbook_recipes_recipe_cookbook", "cookbook_recipes", "recipe_id, cookbook_id")
+    if m.has_column("recipes", "cookbook_id"):
+        m.backfill("recipes", COPY_BATCH)
@@ -0,0 +1,18 @@
+"""
+Índices de claves foráneas y de los filtros de get_recipes (country/type con
+el orden del cursor). Se construyen con CREATE INDEX CONCURRENTLY en Postgres.
+"""
+
+INDEXES = [
+    ("ix_recipes_owner_id", "recipes", "owner_id"),
+    ("ix_recipes_country_created_at_id", "recipes", "country, created_at, id"),
+    ("ix_recipes_type_created_at_id", "recipes", "type, created_at, id"),
+    ("ix_cookbooks_owner_id", "cookbooks", "owner_id"),
+    ("ix_ratings_recipe_id", "ratings", "recipe_id"),
+    ("ix_ratings_cookbook_id", "ratings", "cookbook_id"),
+]
+
+
+def upgrade(m):
+    for name, table, columns in INDEXES:
+        m.create_index(name, table, columns)
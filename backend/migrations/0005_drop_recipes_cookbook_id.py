@@ -0,0 +1,34 @@
+"""
+Paso "contract" de 0003: se corre con `python migrate.py post-deploy`, cuando
+ya no quedan instancias que usen recipes.cookbook_id.
+
+Primero copia lo que las instancias viejas escribieron durante el despliegue
+(recetas con cookbook_id que todavía no están en ningún recetario) y vacía la
+columna en el mismo lote. Conviene correrlo apenas termina el despliegue: una
+receta que alguien sacó de todos sus recetarios con el código nuevo y que aún
+tiene cookbook_id volvería a su recetario viejo. Después, en Postgres, borra la columna (solo toca el
+catálogo). SQLite no puede borrar una columna con foreign key: queda vacía.
+"""
+
+POST_DEPLOY = True
+
+CATCH_UP_BATCH = [
+    """
+    INSERT INTO cookbook_recipes (cookbook_id, recipe_id, position)
+    SELECT r.cookbook_id, r.id, r.id
+    FROM recipes r
+    WHERE r.id >= :start AND r.id < :end
+      AND r.cookbook_id IS NOT NULL
+      AND EXISTS (SELECT 1 FROM cookbooks c WHERE c.id = r.cookbook_id)
+      AND NOT EXISTS (SELECT 1 FROM cookbook_recipes cr WHERE cr.recipe_id = r.id)
+    """,
+    "UPDATE recipes SET cookbook_id = NULL WHERE id >= :start AND id < :end AND cookbook_id IS NOT NULL",
+]
+
+
+def upgrade(m):
+    if not m.has_column("recipes", "cookbook_id"):
+        return
+    m.backfill("recipes", CATCH_UP_BATCH)
+    if m.is_postgres:
+        m.execute("ALTER TABLE recipes DROP COLUMN IF EXISTS cookbook_id")
@@ -0,0 +1,12 @@
+"""
+Reconstruye recipe_ingredients para todas las recetas, por lotes: llena el
+índice en bases con recetas anteriores a él y vuelve a generar las claves con
+la normalización actual (plurales en -es). Usa ingredient_index a propósito:
+las claves tienen que coincidir con las que escribe la app. Si cambia
+normalize_name, se agrega otra migración igual a esta.
+"""
+import ingredient_index
+
+
+def upgrade(m):
+    m.backfill("recipes", [ingredient_index.backfill_range])
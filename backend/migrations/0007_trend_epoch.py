@@ -0,0 +1,28 @@
+"""
+Tabla trend_epoch: la época de los trend_score pasa de una constante en el
+código a una fila que leaderboard.rescale() mueve hacia adelante. Arranca en
+2024-01-01, la época con la que el código anterior calculó los puntajes
+guardados, así que sirve con ambas versiones durante el despliegue.
+"""
+import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table
+
+metadata = MetaData()
+
+trend_epoch = Table(
+    "trend_epoch", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("epoch", DateTime, nullable=False),
+)
+
+INITIAL_EPOCH = datetime.datetime(2024, 1, 1)
+
+
+def upgrade(m):
+    m.create_tables(trend_epoch)
+    m.execute(
+        "INSERT INTO trend_epoch (id, epoch) SELECT 1, :epoch "
+        "WHERE NOT EXISTS (SELECT 1 FROM trend_epoch WHERE id = 1)",
+        epoch=INITIAL_EPOCH,
+    )
@@ -0,0 +1,30 @@
+"""
+Recalcula trend_score desde los ratings, por lotes de id: las recetas y
+recetarios anteriores a "trending" quedaron con 0. Post-deploy: primero mueve
+la época a ahora (rescale), y las instancias viejas sumarían votos con la
+época fija de antes.
+"""
+from sqlalchemy.orm import Session
+
+import leaderboard
+
+POST_DEPLOY = True
+
+
+def _rescale(conn):
+    with Session(bind=conn) as db:
+        leaderboard.rescale(db)
+
+
+def _rebuild(kind):
+    def step(conn, start, end):
+        with Session(bind=conn) as db:
+            leaderboard.rebuild_trend_range(db, kind, start, end)
+            db.flush()
+    return step
+
+
+def upgrade(m):
+    m.execute(_rescale)
+    m.backfill("recipes", [_rebuild("recipe")])
+    m.backfill("cookbooks", [_rebuild("cookbook")])
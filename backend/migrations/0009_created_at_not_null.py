@@ -0,0 +1,23 @@
+"""
+created_at de recetas y recetarios NOT NULL: es la clave de los cursores de
+paginación (created_at, id) y una fila sin fecha rompía encode_cursor y
+quedaba fuera de las páginas siguientes. Las filas anteriores a la columna
+toman la fecha más antigua de su tabla (quedan al final de los listados, en
+orden de id) y después se agrega la restricción (ver Migrator.set_not_null).
+"""
+
+TABLES = ["recipes", "cookbooks"]
+
+FILL_BATCH = """
+UPDATE {table} SET created_at = COALESCE(
+    (SELECT min(created_at) FROM {table}),
+    CURRENT_TIMESTAMP
+)
+WHERE id >= :start AND id < :end AND created_at IS NULL
+"""
+
+
+def upgrade(m):
+    for table in TABLES:
+        m.backfill(table, [FILL_BATCH.format(table=table)])
+        m.set_not_null(table, "created_at")
@@ -0,0 +1,31 @@
+"""
+Tabla list_versions: un contador por listado (recipes, cookbooks) que crud
+incrementa en cada escritura y que reemplaza a count/max(updated_at) como
+versión (ETag) de los listados. Esas agregaciones recorrían la tabla completa
+en cada GET.
+
+Mientras dura el despliegue las instancias viejas escriben sin incrementarlo:
+un listado puede responder 304 con contenido viejo hasta la siguiente escritura
+de una instancia nueva.
+"""
+from sqlalchemy import BigInteger, Column, MetaData, String, Table
+
+metadata = MetaData()
+
+list_versions = Table(
+    "list_versions", metadata,
+    Column("name", String, primary_key=True),
+    Column("version", BigInteger, nullable=False, server_default="0"),
+)
+
+LISTS = ("recipes", "cookbooks")
+
+
+def upgrade(m):
+    m.create_tables(list_versions)
+    for name in LISTS:
+        m.execute(
+            "INSERT INTO list_versions (name, version) SELECT :name, 1 "
+            "WHERE NOT EXISTS (SELECT 1 FROM list_versions WHERE name = :name)",
+            name=name,
+        )
@@ -0,0 +1,12 @@
+"""
+Llena recipe_facets desde recipes. Antes lo hacía get_facets en el primer GET
+con la tabla vacía: un GROUP BY y escrituras dentro de una lectura, y dos
+primeros pedidos simultáneos chocaban en la clave primaria. Un solo
+INSERT ... SELECT por faceta, en la transacción que bloquea recipe_facets
+(ver facets.rebuild).
+"""
+import facets
+
+
+def upgrade(m):
+    m.execute(facets.rebuild)
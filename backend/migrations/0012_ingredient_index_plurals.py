@@ -0,0 +1,10 @@
+"""
+Vuelve a generar las claves de recipe_ingredients: normalize_name cambió para
+plurales en -ces (dulces -> dulce, no dulz) e -ies (especies -> especie, no
+especi). Igual que 0006.
+"""
+import ingredient_index
+
+
+def upgrade(m):
+    m.backfill("recipes", [ingredient_index.backfill_range])
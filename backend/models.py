@@ -1,9 +1,27 @@
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON, Index, UniqueConstraint
+from sqlalchemy import BigInteger, Float, case, cast
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
 
+class RatingAggregateMixin:
+    """Promedio a partir de rating_sum/rating_count; también usable en ORDER BY."""
+
+    @hybrid_property
+    def rating_average(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @rating_average.expression
+    def rating_average(cls):
+        return case(
+            (cls.rating_count > 0, cast(cls.rating_sum, Float) / cls.rating_count),
+            else_=None,
+        )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -11,25 +29,50 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    # Al incrementarse invalida todos los access/refresh tokens emitidos antes
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    tokens_revoked_at = Column(DateTime, nullable=True, index=True)
 
     recipes = relationship("Recipe", back_populates="owner")
     cookbooks = relationship("Cookbook", back_populates="owner")
 
-class Cookbook(Base):
+class Cookbook(RatingAggregateMixin, Base):
     __tablename__ = "cookbooks"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(String)
     pdf_url = Column(String, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    pdf_hash = Column(String, nullable=True)  # Hash del contenido con el que se generó pdf_url
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # Agregados de ratings mantenidos en la misma transacción que cada voto
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Puntaje acumulado para "trending" (ver leaderboard.py)
+    trend_score = Column(Float, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="cookbooks")
-    recipes = relationship("Recipe", back_populates="cookbook")
+    # Recetas en el orden del recetario (tabla cookbook_recipes). Solo lectura:
+    # la membresía se modifica por conjuntos en crud (ver _add_cookbook_recipes)
+    recipes = relationship(
+        "Recipe",
+        secondary="cookbook_recipes",
+        order_by="[CookbookRecipe.position, CookbookRecipe.recipe_id]",
+        back_populates="cookbooks",
+        viewonly=True,
+    )
     ratings = relationship("Rating", back_populates="cookbook")
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    # Versión de la fila para ETags (se actualiza en cada UPDATE)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Paginación por cursor (created_at, id)
+        Index("ix_cookbooks_created_at_id", "created_at", "id"),
+        Index("ix_cookbooks_trend_score", "trend_score"),
+    )
 
-class Recipe(Base):
+class Recipe(RatingAggregateMixin, Base):
     __tablename__ = "recipes"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -44,26 +87,126 @@ class Recipe(Base):
     preparation_time_minutes = Column(Integer, default=0)
     difficulty = Column(String, default="medium")
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    # Versión de la fila para ETags (se actualiza en cada UPDATE)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
-    owner_id = Column(Integer, ForeignKey("users.id"))
-    cookbook_id = Column(Integer, ForeignKey("cookbooks.id"), nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # recipes.cookbook_id (una receta, un recetario) queda solo en la base hasta
+    # la migración post-deploy 0005; el modelo ya no lo usa (sin índice).
+    # Agregados de ratings mantenidos en la misma transacción que cada voto
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Puntaje acumulado para "trending" (ver leaderboard.py)
+    trend_score = Column(Float, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="recipes")
-    cookbook = relationship("Cookbook", back_populates="recipes")
+    cookbooks = relationship("Cookbook", secondary="cookbook_recipes", back_populates="recipes", viewonly=True)
     ratings = relationship("Rating", back_populates="recipe")
+    ingredient_keys = relationship("RecipeIngredient", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Paginación por cursor (created_at, id)
+        Index("ix_recipes_created_at_id", "created_at", "id"),
+        Index("ix_recipes_trend_score", "trend_score"),
+        # Filtros de get_recipes; con el orden del cursor, la página sale del índice
+        Index("ix_recipes_country_created_at_id", "country", "created_at", "id"),
+        Index("ix_recipes_type_created_at_id", "type", "created_at", "id"),
+    )
+
+class CookbookRecipe(Base):
+    """Pertenencia ordenada receta/recetario: una receta puede estar en varios recetarios."""
+    __tablename__ = "cookbook_recipes"
+
+    cookbook_id = Column(Integer, ForeignKey("cookbooks.id", ondelete="CASCADE"), primary_key=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Recetas de un recetario en orden (cookbook_id = ? ORDER BY position)
+        Index("ix_cookbook_recipes_cookbook_position", "cookbook_id", "position", "recipe_id"),
+        # Recetarios que incluyen una receta (invalidación de documentos)
+        Index("ix_cookbook_recipes_recipe_cookbook", "recipe_id", "cookbook_id"),
+    )
+
+class RecipeIngredient(Base):
+    """Índice invertido de ingredientes (nombres normalizados, ver ingredient_index.py)."""
+    __tablename__ = "recipe_ingredients"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String, primary_key=True)
+
+    __table_args__ = (
+        # Búsqueda por ingrediente: name -> recipe_id sin tocar la tabla
+        Index("ix_recipe_ingredients_name_recipe", "name", "recipe_id"),
+    )
+
+class RecipeFacet(Base):
+    """Conteo de recetas por valor de faceta (country/type/difficulty), ver facets.py."""
+    __tablename__ = "recipe_facets"
+
+    facet = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
 
 class Rating(Base):
     __tablename__ = "ratings"
     
     id = Column(Integer, primary_key=True, index=True)
     score = Column(Integer) # 1-5
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)  # Último cambio del voto
     
     user_id = Column(Integer, ForeignKey("users.id"))
-    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True)
-    cookbook_id = Column(Integer, ForeignKey("cookbooks.id"), nullable=True)
+    # user_id queda cubierto por los índices únicos (user_id, recipe_id/cookbook_id)
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=True, index=True)
+    cookbook_id = Column(Integer, ForeignKey("cookbooks.id"), nullable=True, index=True)
     
     user = relationship("User")
     recipe = relationship("Recipe", back_populates="ratings")
     cookbook = relationship("Cookbook", back_populates="ratings")
 
+    __table_args__ = (
+        # Un voto por usuario y receta/recetario
+        UniqueConstraint("user_id", "recipe_id", name="uq_ratings_user_recipe"),
+        UniqueConstraint("user_id", "cookbook_id", name="uq_ratings_user_cookbook"),
+    )
+
+class RefreshToken(Base):
+    """Refresh token emitido (por jti). Se rota en cada uso; revoked_at marca los usados."""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True)  # jti
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_version = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+class LeaderboardEntry(Base):
+    """Último snapshot de "trending" persistido (ver leaderboard.py)."""
+    __tablename__ = "leaderboard_entries"
+
+    kind = Column(String, primary_key=True)  # 'recipe' | 'cookbook'
+    rank = Column(Integer, primary_key=True)
+    target_id = Column(Integer, nullable=False)
+    title = Column(String)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
+class TrendEpoch(Base):
+    """Época de los trend_score (ver leaderboard.py). Una sola fila, id = 1."""
+    __tablename__ = "trend_epoch"
+
+    id = Column(Integer, primary_key=True)
+    epoch = Column(DateTime, nullable=False)
+
+class ListVersion(Base):
+    """
+    Contador de versión por listado ('recipes' | 'cookbooks'), parte del ETag de
+    GET /recipes y /cookbooks. crud lo incrementa en la transacción de cada
+    escritura que cambia el listado (los votos no, ver http_cache).
+    """
+    __tablename__ = "list_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
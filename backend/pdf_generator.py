@@ -7,8 +7,12 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.lib.units import inch
 from reportlab.lib.utils import ImageReader
 from io import BytesIO
+import hashlib
+import json
 import os
-import requests
+from types import SimpleNamespace
+from services.image_fetcher import image_fetcher
+from services.image_variants import variant_url
 
 # --- 🎨 CONFIGURACIÓN DE ESTILO DEL PDF ---
 class PDFStyleConfig:
@@ -29,6 +33,58 @@ class PDFStyleConfig:
     
     SPACE_AFTER_TITLE = 30
 
+# Subir este número cuando cambie el layout, para invalidar los PDFs cacheados
+PDF_RENDER_VERSION = 1
+
+def _style_config_snapshot():
+    return {k: v for k, v in vars(PDFStyleConfig).items() if k.isupper()}
+
+def recipe_pdf_data(recipe):
+    """Datos planos (serializables) de una receta que usa el PDF."""
+    return {
+        "title": recipe.title,
+        "country": recipe.country,
+        "difficulty": recipe.difficulty,
+        "preparation_time_minutes": recipe.preparation_time_minutes,
+        "image_url": recipe.image_url,
+        "notes": recipe.notes,
+        "ingredients": recipe.ingredients,
+        "instructions": recipe.instructions,
+        "instructions_format": recipe.instructions_format,
+    }
+
+def cookbook_pdf_data(cookbook):
+    """Datos planos de un recetario, con sus recetas en orden. Se puede enviar a otro proceso."""
+    return {
+        "title": cookbook.title,
+        "description": cookbook.description,
+        "recipes": [recipe_pdf_data(r) for r in cookbook.recipes],
+    }
+
+def _hash_payload(payload):
+    raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def recipe_pdf_fingerprint(recipe, author_name):
+    """Hash del contenido que afecta al PDF de una receta (incluye URL de imagen y estilo)."""
+    return _hash_payload({
+        "kind": "recipe",
+        "version": PDF_RENDER_VERSION,
+        "style": _style_config_snapshot(),
+        "author": author_name,
+        "recipe": recipe_pdf_data(recipe),
+    })
+
+def cookbook_pdf_fingerprint(cookbook, author_name):
+    """Hash del contenido que afecta al PDF de un recetario, respetando el orden de las recetas."""
+    return _hash_payload({
+        "kind": "cookbook",
+        "version": PDF_RENDER_VERSION,
+        "style": _style_config_snapshot(),
+        "author": author_name,
+        "cookbook": cookbook_pdf_data(cookbook),
+    })
+
 def get_custom_styles():
     """Genera los estilos basados en la configuración."""
     base_styles = getSampleStyleSheet()
@@ -88,19 +144,25 @@ def get_custom_styles():
         )
     }
 
-def get_image_from_url(url):
-    """Descarga imagen de URL y retorna archivo en memoria compatible (BytesIO)."""
+def get_image_from_url(url, images=None):
+    """
+    Retorna la imagen como archivo en memoria compatible (BytesIO).
+    Usa las imágenes precargadas si se pasan; si no, la caché/sesión compartida.
+    """
     if not url:
         return None
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return BytesIO(response.content)
-    except Exception as e:
-        print(f"Error downloading image {url}: {e}")
-        return None
+    # Variante de tamaño PDF si la imagen viene del pipeline de subida
+    url = variant_url(url, "pdf")
+    data = images.get(url) if images is not None else None
+    if data is None:
+        data = image_fetcher.fetch(url)
+    return BytesIO(data) if data is not None else None
+
+def prefetch_recipe_images(recipes):
+    """Descarga en paralelo las imágenes de todas las recetas antes de armar el PDF."""
+    return image_fetcher.prefetch(variant_url(r.image_url, "pdf") for r in recipes if r.image_url)
 
-def build_recipe_stories(recipe, author_name, styles):
+def build_recipe_stories(recipe, author_name, styles, images=None):
     """Construye el contenido de una sola receta."""
     story = []
 
@@ -117,7 +179,7 @@ def build_recipe_stories(recipe, author_name, styles):
 
     # Imagen
     if recipe.image_url:
-        img_data = get_image_from_url(recipe.image_url)
+        img_data = get_image_from_url(recipe.image_url, images)
         
         if img_data:
             try:
@@ -197,18 +259,29 @@ def build_recipe_stories(recipe, author_name, styles):
             
     return story
 
-def generate_recipe_pdf(recipe, author_name):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72, title=recipe.title)
+def _create_document(output, title):
+    """
+    Documento que escribe en `output` (ruta o archivo). Si output es None se usa
+    un BytesIO y el generador retorna los bytes.
+    """
+    target = output if output is not None else BytesIO()
+    doc = SimpleDocTemplate(target, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72, title=title)
+    return doc, target
+
+def _finish_document(doc, story, output, target):
+    doc.build(story)
+    if output is None:
+        return target.getvalue()
+    return output
+
+def generate_recipe_pdf(recipe, author_name, output=None):
+    doc, target = _create_document(output, recipe.title)
     styles = get_custom_styles()
     story = build_recipe_stories(recipe, author_name, styles)
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue()  # Return bytes directly
+    return _finish_document(doc, story, output, target)
 
-def generate_cookbook_pdf(cookbook, author_name):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72, title=cookbook.title)
+def generate_cookbook_pdf(cookbook, author_name, output=None):
+    doc, target = _create_document(output, cookbook.title)
     styles = get_custom_styles()
     story = []
     
@@ -237,12 +310,24 @@ def generate_cookbook_pdf(cookbook, author_name):
     story.append(PageBreak())
     
     # --- Recetas ---
+    images = prefetch_recipe_images(cookbook.recipes)
     for i, recipe in enumerate(cookbook.recipes):
-        recipe_content = build_recipe_stories(recipe, None, styles)
+        recipe_content = build_recipe_stories(recipe, None, styles, images)
         story.extend(recipe_content)
         if i < len(cookbook.recipes) - 1:
             story.append(PageBreak())
             
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue() # Return bytes directly
+    return _finish_document(doc, story, output, target)
+
+# --- Render desde datos planos (para ejecutar en un ProcessPoolExecutor) ---
+# Escriben directo a output_path: el PDF no vuelve al proceso padre como bytes.
+def render_recipe_pdf_data(recipe_data, author_name, output_path):
+    return generate_recipe_pdf(SimpleNamespace(**recipe_data), author_name, output=output_path)
+
+def render_cookbook_pdf_data(cookbook_data, author_name, output_path):
+    cookbook = SimpleNamespace(
+        title=cookbook_data["title"],
+        description=cookbook_data["description"],
+        recipes=[SimpleNamespace(**r) for r in cookbook_data["recipes"]],
+    )
+    return generate_cookbook_pdf(cookbook, author_name, output=output_path)
@@ -0,0 +1,115 @@
+import bisect
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Instrumentación del pool de conexiones: latencia de checkout (histograma),
+# checkouts que esperaron por pool lleno, timeouts y conexiones de overflow.
+# Sirve para dimensionar workers x (pool_size + max_overflow) contra el
+# límite de conexiones del pooler de Supabase.
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.overflow_events = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+        self._buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.pool = None
+
+    def record_checkout(self, latency_ms: float, waited: bool, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.overflow_events += overflowed
+            self.latency_total_ms += latency_ms
+            self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+            self._buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+            self.waits += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(list(LATENCY_BUCKETS_MS) + ["+Inf"], self._buckets):
+                cumulative += count
+                histogram[f"le_{bound}"] = cumulative
+            result = {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "overflow_events": self.overflow_events,
+                "checkout_latency_ms": {
+                    "avg": self.latency_total_ms / self.checkouts if self.checkouts else None,
+                    "max": self.latency_max_ms,
+                    "histogram": histogram,
+                },
+            }
+        if self.pool is not None:
+            result["pool"] = {
+                "size": self.pool.size(),
+                "max_overflow": self.pool._max_overflow,
+                "checked_out": self.pool.checkedout(),
+                "checked_in": self.pool.checkedin(),
+                "overflow": max(self.pool.overflow(), 0),
+            }
+        return result
+
+
+registry: Dict[str, PoolMetrics] = {}
+
+
+def _instrumented(base):
+    class InstrumentedPool(base):
+        """QueuePool que mide cada checkout en pool_metrics."""
+
+        metrics_name = "default"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._metrics = registry.setdefault(self.metrics_name, PoolMetrics(self.metrics_name))
+            self._metrics.pool = self
+
+        def _do_get(self):
+            # Pool lleno (incluido overflow): este checkout va a esperar
+            waited = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+            overflow_before = self.overflow()
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                self._metrics.record_timeout()
+                raise
+            latency_ms = (time.perf_counter() - start) * 1000
+            overflowed = self.overflow() > max(overflow_before, 0)
+            self._metrics.record_checkout(latency_ms, waited, overflowed)
+            return conn
+
+    return InstrumentedPool
+
+
+_InstrumentedQueuePool = _instrumented(QueuePool)
+_InstrumentedAsyncQueuePool = _instrumented(AsyncAdaptedQueuePool)
+
+
+def pool_class(name: str, async_: bool = False):
+    """Clase de pool instrumentada que registra sus métricas bajo `name`."""
+    base = _InstrumentedAsyncQueuePool if async_ else _InstrumentedQueuePool
+    return type(base.__name__, (base,), {"metrics_name": name})
+
+
+def snapshot() -> dict:
+    return {name: metrics.snapshot() for name, metrics in registry.items()}
@@ -1,13 +1,18 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from uuid import uuid4
+from starlette.concurrency import run_in_threadpool
 import crud
 import models
 import schemas
 from database import get_db
+from services.cache import TTLCache
+from services.password_hasher import password_hasher
+from token_revocation import revocation_list
 
 router = APIRouter()
 
@@ -16,6 +21,11 @@ import os
 SECRET_KEY = os.getenv("SECRET_KEY", "SECRET_KEY_CHANGE_ME")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+
+# Cache del principal (id/username) por "sub" del token, para no ir a la DB en cada request
+principal_cache = TTLCache(maxsize=4096, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -29,21 +39,87 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def issue_tokens(db: Session, user) -> dict:
+    """
+    Access token con id y token_version del usuario (se valida sin ir a la DB)
+    y refresh token rotativo registrado por jti.
+    """
+    access_token = create_access_token(
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version, "type": "access"},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    jti = uuid4().hex
+    refresh_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    refresh_token = create_access_token(
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version, "type": "refresh", "jti": jti},
+        expires_delta=refresh_expires,
+    )
+    crud.create_refresh_token(db, user.id, user.token_version, jti, datetime.utcnow() + refresh_expires)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode(token: str, token_type: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    # Los tokens emitidos antes de los refresh tokens no tienen "type"
+    if payload.get("sub") is None or payload.get("type", "access") != token_type:
+        raise _credentials_exception()
+    return payload
+
+def decode_token(token: str) -> schemas.TokenData:
+    payload = _decode(token, "access")
+    return schemas.TokenData(username=payload["sub"], user_id=payload.get("uid"), token_version=payload.get("ver"))
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.Principal:
+    """
+    Dependencia ligera para endpoints de escritura: solo id y username.
+    No carga recetas ni recetarios, así el costo no depende de cuánto tenga el usuario.
+    """
+    token_data = decode_token(token)
+
+    if token_data.user_id is not None and token_data.token_version is not None:
+        # Camino sin DB: firma + versión contra la lista de revocación en memoria
+        if not revocation_list.synced:
+            await run_in_threadpool(revocation_list.sync, db)
+        if revocation_list.is_revoked(token_data.user_id, token_data.token_version):
+            raise _credentials_exception()
+        return schemas.Principal(id=token_data.user_id, username=token_data.username)
+
+    # Tokens sin uid/ver (emitidos antes): se resuelven por username
+    principal = principal_cache.get(token_data.username)
+    if principal is not None:
+        return principal
+
+    row = await run_in_threadpool(
+        lambda: db.query(models.User.id, models.User.username).filter(
+            models.User.username == token_data.username
+        ).first()
+    )
+    if row is None:
+        raise _credentials_exception()
+
+    principal = schemas.Principal(id=row.id, username=row.username)
+    principal_cache.set(token_data.username, principal)
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Usuario completo con su grafo de recetas/recetarios. Solo para /users/me."""
+    credentials_exception = _credentials_exception()
+    token_data = decode_token(token)
+
     # Eagerly load recipes and cookbooks to avoid lazy loading issues
     user = db.query(models.User).options(
         joinedload(models.User.recipes),
@@ -52,29 +128,65 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     
     if user is None:
         raise credentials_exception
+    if token_data.token_version is not None and token_data.token_version != user.token_version:
+        raise credentials_exception
     return user
 
+# /register y /token son async: bcrypt corre en el executor acotado de
+# password_hasher y las consultas cortas en el threadpool, así un pico de
+# logins no deja sin hilos a los endpoints de lectura.
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(crud.get_user_by_username, db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    hashed_password = await password_hasher.hash(user.password)
+    return await run_in_threadpool(crud.create_user, db=db, user=user, hashed_password=hashed_password)
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_username(db, username=form_data.username)
-    if not user or not crud.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(crud.get_user_by_username, db, username=form_data.username)
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if password_hasher.needs_rehash(user.hashed_password):
+        # Cambió BCRYPT_ROUNDS: se actualiza el hash con la contraseña ya verificada
+        new_hash = await password_hasher.hash(form_data.password)
+        await run_in_threadpool(crud.update_password_hash, db, user.id, new_hash)
+        password_hasher.record_rehash()
+    return await run_in_threadpool(issue_tokens, db, user)
+
+@router.post("/token/refresh", response_model=schemas.Token)
+def refresh_access_token(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Canjea un refresh token por un par nuevo (rotación: el usado queda revocado)."""
+    payload = _decode(body.refresh_token, "refresh")
+    rotated = crud.rotate_refresh_token(db, payload.get("jti"))
+    if rotated is None:
+        raise _credentials_exception()
+    _, user = rotated
+    return issue_tokens(db, user)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    body: schemas.RefreshRequest,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    payload = _decode(body.refresh_token, "refresh")
+    crud.revoke_refresh_token(db, payload.get("jti"), current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/logout/all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_everywhere(
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    """Invalida todos los access y refresh tokens del usuario (incrementa token_version)."""
+    crud.revoke_user_tokens(db, current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/users/me", response_model=schemas.User)
 async def read_users_me(current_user: models.User = Depends(get_current_user)):
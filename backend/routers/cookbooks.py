@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 import crud
-import models
+import crud_async
+import http_cache
 import schemas
-from database import get_db
-from routers.auth import get_current_user
-from pdf_generator import generate_cookbook_pdf
+import serializers
+from database import ReadSession, get_db, get_read_db
+from routers.auth import get_current_principal
+from pdf_generator import cookbook_pdf_data, cookbook_pdf_fingerprint
+from services.pdf_cache import pdf_cache
+from services.pdf_jobs import pdf_render_service
+from services.storage import StorageService
 
 
 router = APIRouter(
@@ -21,18 +27,29 @@ def get_cookbook_pdf(cookbook_id: int, db: Session = Depends(get_db)):
     if db_cookbook is None:
         raise HTTPException(status_code=404, detail="Cookbook not found")
         
-    # Generate PDF (bytes)
-    pdf_bytes = generate_cookbook_pdf(db_cookbook, db_cookbook.owner.username)
+    author_name = db_cookbook.owner.username
+    fingerprint = cookbook_pdf_fingerprint(db_cookbook, author_name)
+
+    # Si el contenido no cambió, el PDF ya subido sigue siendo válido
+    if db_cookbook.pdf_url and db_cookbook.pdf_hash == fingerprint:
+        return {"url": db_cookbook.pdf_url}
+
+    # Generate PDF (archivo en la caché local), reutilizando el render si existe
+    # Abierto: otro request o worker puede desalojarlo de la caché
+    pdf_file = pdf_cache.open(fingerprint)
+    if pdf_file is None:
+        pdf_file = pdf_render_service.render_cookbook(cookbook_pdf_data(db_cookbook), author_name, fingerprint)
     
-    # Upload to Supabase
-    filename = f"cookbook_{cookbook_id}_{db_cookbook.title.replace(' ', '_')}.pdf"
+    # Upload to Supabase (el hash en el nombre evita servir versiones viejas desde caché)
+    filename = f"cookbook_{cookbook_id}_{fingerprint[:16]}.pdf"
     try:
-        from ..services.storage import StorageService
-        public_url = StorageService.upload_pdf(pdf_bytes, filename)
+        with pdf_file:
+            public_url = StorageService.upload_pdf(pdf_file.read(), filename)
         
         # Save URL to DB
         # We need to update existing cookbook instance.
         db_cookbook.pdf_url = public_url
+        db_cookbook.pdf_hash = fingerprint
         db.commit()
         db.refresh(db_cookbook)
         
@@ -43,61 +60,179 @@ def get_cookbook_pdf(cookbook_id: int, db: Session = Depends(get_db)):
         # Requirement says "Generar y guardar". 
         raise HTTPException(status_code=500, detail="Error generating/uploading PDF")
 
+@router.post("/{cookbook_id}/pdf/jobs", response_model=schemas.PDFJob, status_code=status.HTTP_202_ACCEPTED)
+def create_cookbook_pdf_job(cookbook_id: int, db: Session = Depends(get_db)):
+    db_cookbook = crud.get_cookbook(db, cookbook_id=cookbook_id)
+    if db_cookbook is None:
+        raise HTTPException(status_code=404, detail="Cookbook not found")
+
+    author_name = db_cookbook.owner.username
+    fingerprint = cookbook_pdf_fingerprint(db_cookbook, author_name)
+    if db_cookbook.pdf_url and db_cookbook.pdf_hash == fingerprint:
+        job = pdf_render_service.completed_job(cookbook_id, fingerprint, db_cookbook.pdf_url)
+    else:
+        # Se envían datos planos al proceso de render, no objetos ORM
+        job = pdf_render_service.submit_cookbook_job(
+            cookbook_id, cookbook_pdf_data(db_cookbook), author_name, fingerprint
+        )
+    return job.to_dict()
+
+@router.get("/{cookbook_id}/pdf/jobs/{job_id}", response_model=schemas.PDFJob)
+def read_cookbook_pdf_job(cookbook_id: int, job_id: str):
+    job = pdf_render_service.get_job(job_id)
+    if job is None or job.cookbook_id != cookbook_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @router.post("/", response_model=schemas.Cookbook)
 def create_cookbook(
     cookbook: schemas.CookbookCreate, 
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_principal)
 ):
     return crud.create_cookbook(db=db, cookbook=cookbook, user_id=current_user.id)
 
-@router.get("/", response_model=List[schemas.Cookbook])
-def read_cookbooks(
+# Las variantes "summary" van primero para que la validación no las confunda con Cookbook
+@router.get("/", response_model=Union[
+    List[schemas.CookbookSummary], List[schemas.Cookbook],
+    schemas.CookbookSummaryPage, schemas.CookbookPage,
+])
+async def read_cookbooks(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    paginate: str = "offset",
+    cursor: Optional[str] = None,
+    view: str = "full",
+    sort: Optional[str] = None,
+    db: ReadSession = Depends(get_read_db)
 ):
-    cookbooks = crud.get_cookbooks(db, skip=skip, limit=limit, search=search)
+    # 304 antes de cargar y serializar la página si el conjunto no cambió
+    etag = http_cache.make_etag(
+        "cookbooks", await crud_async.get_list_version(db, "cookbooks"), http_cache.list_window(),
+        search, skip, limit, paginate, cursor, view, sort,
+    )
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+
+    summary = view == "summary"
+    if serializers.FAST_SERIALIZATION and not summary:
+        # Columnas -> dicts -> orjson, sin objetos ORM ni validación pydantic
+        if paginate == "cursor" or cursor:
+            items, next_cursor = await crud_async.get_cookbook_rows_page(db, cursor=cursor, limit=limit, search=search)
+            content = {"items": items, "next_cursor": next_cursor}
+        else:
+            content = await crud_async.get_cookbook_rows(db, skip=skip, limit=limit, search=search, sort=sort)
+        return serializers.json_response(content, headers=http_cache.cache_headers(etag))
+    http_cache.set_cache_headers(response, etag)
+
+    # En vista resumida no se cargan las recetas anidadas
+    depth = 0 if summary else crud.COOKBOOK_FULL_DEPTH
+
+    # Modo cursor: ?paginate=cursor (primera página) o ?cursor=... (siguientes)
+    if paginate == "cursor" or cursor:
+        items, next_cursor = await crud_async.get_cookbooks_page(db, cursor=cursor, limit=limit, search=search, depth=depth)
+        if summary:
+            items = await crud_async.summarize_cookbooks(db, items)
+        return {"items": items, "next_cursor": next_cursor}
+
+    # ?sort=rating ordena por promedio de votos (solo en modo offset)
+    cookbooks = await crud_async.get_cookbooks(db, skip=skip, limit=limit, search=search, depth=depth, sort=sort)
+    if summary:
+        return await crud_async.summarize_cookbooks(db, cookbooks)
     return cookbooks
 
 @router.get("/{cookbook_id}", response_model=schemas.Cookbook)
-def read_cookbook(cookbook_id: int, db: Session = Depends(get_db)):
-    cookbook = crud.get_cookbook(db, cookbook_id=cookbook_id)
-    if cookbook is None:
+async def read_cookbook(cookbook_id: int, request: Request, response: Response, db: ReadSession = Depends(get_read_db)):
+    version = await crud_async.get_cookbook_version(db, cookbook_id=cookbook_id)
+    etag = http_cache.make_etag("cookbook", cookbook_id, version)
+    if version is not None and http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    document = await crud_async.get_cookbook_document(db, cookbook_id=cookbook_id, version=version)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Cookbook not found")
+    http_cache.set_cache_headers(response, etag)
+    return document
+
+def _check_cookbook_owner(db: Session, cookbook_id: int, current_user: schemas.Principal, detail: str):
+    # Solo el owner_id: no hace falta cargar las recetas para verificar permisos
+    owner_id = crud.get_cookbook_owner_id(db, cookbook_id)
+    if owner_id is None:
         raise HTTPException(status_code=404, detail="Cookbook not found")
-    return cookbook
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail=detail)
 
 @router.put("/{cookbook_id}", response_model=schemas.Cookbook)
 def update_cookbook(
     cookbook_id: int,
     cookbook: schemas.CookbookUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_principal)
 ):
-    db_cookbook = crud.get_cookbook(db, cookbook_id=cookbook_id)
-    if db_cookbook is None:
-        raise HTTPException(status_code=404, detail="Cookbook not found")
-    
-    # Verificar que el usuario sea el dueño
-    if db_cookbook.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to edit this cookbook")
-    
+    _check_cookbook_owner(db, cookbook_id, current_user, "Not authorized to edit this cookbook")
     return crud.update_cookbook(db=db, cookbook_id=cookbook_id, cookbook=cookbook)
 
+@router.patch("/{cookbook_id}/recipes", response_model=schemas.CookbookMembershipResult)
+def update_cookbook_recipes(
+    cookbook_id: int,
+    change: schemas.CookbookMembershipUpdate,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    """
+    Agrega/quita recetas por id (o reemplaza el conjunto con "replace") con
+    UPDATEs por conjunto. Solo se mueven recetas del dueño del recetario.
+    """
+    if change.replace is not None and (change.add or change.remove):
+        raise HTTPException(status_code=400, detail="Use either replace or add/remove")
+    _check_cookbook_owner(db, cookbook_id, current_user, "Not authorized to edit this cookbook")
+    result = crud.change_cookbook_recipes(
+        db, cookbook_id, current_user.id, add=change.add, remove=change.remove, replace=change.replace
+    )
+    return {"added": result.added, "removed": result.removed}
+
 @router.delete("/{cookbook_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_cookbook(
     cookbook_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_principal)
 ):
-    db_cookbook = crud.get_cookbook(db, cookbook_id=cookbook_id)
-    if db_cookbook is None:
-        raise HTTPException(status_code=404, detail="Cookbook not found")
-        
-    # Verificar que el usuario sea el dueño
-    if db_cookbook.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this cookbook")
-    
+    _check_cookbook_owner(db, cookbook_id, current_user, "Not authorized to delete this cookbook")
     crud.delete_cookbook(db=db, cookbook_id=cookbook_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# --- Ratings ---
+@router.get("/{cookbook_id}/rating", response_model=schemas.RatingSummary)
+def read_cookbook_rating(cookbook_id: int, db: Session = Depends(get_db)):
+    summary = crud.get_rating_summary(db, "cookbook", cookbook_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Cookbook not found")
+    return {"rating_count": summary.rating_count, "rating_average": summary.rating_average}
+
+@router.put("/{cookbook_id}/rating", response_model=schemas.Rating)
+def rate_cookbook(
+    cookbook_id: int,
+    rating: schemas.RatingCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    if crud.get_rating_summary(db, "cookbook", cookbook_id) is None:
+        raise HTTPException(status_code=404, detail="Cookbook not found")
+    try:
+        return crud.rate(db, "cookbook", cookbook_id, current_user.id, rating.score)
+    except IntegrityError:
+        # Otro request del mismo usuario votó al mismo tiempo
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Rating already being updated, retry")
+
+@router.delete("/{cookbook_id}/rating", status_code=status.HTTP_204_NO_CONTENT)
+def delete_cookbook_rating(
+    cookbook_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    if crud.unrate(db, "cookbook", cookbook_id, current_user.id) is None:
+        raise HTTPException(status_code=404, detail="Rating not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+import schemas
+from database import get_db
+from leaderboard import leaderboard
+
+router = APIRouter(
+    prefix="/trending",
+    tags=["trending"],
+)
+
+@router.get("/", response_model=List[schemas.LeaderboardEntry])
+def read_trending(
+    kind: str = Query("recipe", pattern="^(recipe|cookbook)$"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    # Se sirve del snapshot en memoria; solo en frío se lee el último persistido
+    if not leaderboard.loaded:
+        leaderboard.load(db)
+    return leaderboard.top(kind, limit)
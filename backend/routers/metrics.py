@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+import pool_metrics
+from services.document_cache import document_cache
+from services.password_hasher import password_hasher
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+@router.get("/cache")
+def read_cache_metrics():
+    # Contadores de aciertos/fallos de la caché de documentos (por proceso)
+    return document_cache.stats()
+
+@router.get("/db")
+def read_db_pool_metrics():
+    # Latencia de checkout, esperas, timeouts y overflow por pool (sync/async)
+    return pool_metrics.snapshot()
+
+@router.get("/auth")
+def read_password_hashing_metrics():
+    # Cola del executor de bcrypt: en ejecución, en espera, rechazos y tiempos
+    return password_hasher.stats()
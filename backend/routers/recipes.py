@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
+import bulk_import
 import crud
-import models
+import crud_async
+import http_cache
+import search
+import serializers
 import schemas
-from database import get_db
-from routers.auth import get_current_user
-from pdf_generator import generate_recipe_pdf
+from database import ReadSession, SessionLocal, get_db, get_read_db
+from routers.auth import get_current_principal
+from pdf_generator import recipe_pdf_data, recipe_pdf_fingerprint
+from services.pdf_cache import file_size, iter_file, pdf_cache
+from services.pdf_jobs import pdf_render_service
 
 router = APIRouter(
     prefix="/recipes",
@@ -20,60 +27,167 @@ def get_recipe_pdf(recipe_id: int, db: Session = Depends(get_db)):
     if db_recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
-    # Generate PDF
-    pdf_buffer = generate_recipe_pdf(db_recipe, db_recipe.owner.username)
-    
+    # Solo se renderiza si cambió el contenido (hash) desde la última vez
+    author_name = db_recipe.owner.username
+    fingerprint = recipe_pdf_fingerprint(db_recipe, author_name)
+    # Se trabaja con el archivo abierto: otro request o worker puede desalojarlo
+    pdf_file = pdf_cache.open(fingerprint)
+    if pdf_file is None:
+        # El render corre en el pool de procesos, no en este worker
+        pdf_file = pdf_render_service.render_recipe(recipe_pdf_data(db_recipe), author_name, fingerprint)
+
     headers = {
-        'Content-Disposition': f'attachment; filename="{db_recipe.title}.pdf"'
+        'Content-Disposition': f'attachment; filename="{db_recipe.title}.pdf"',
+        'Content-Length': str(file_size(pdf_file)),
+        'ETag': f'"{fingerprint}"',
     }
-    return StreamingResponse(pdf_buffer, media_type="application/pdf", headers=headers)
+    # Bloques de tamaño fijo con Content-Length, sin cargar el PDF completo en memoria
+    return StreamingResponse(iter_file(pdf_file), media_type="application/pdf", headers=headers)
 
 @router.get("/countries", response_model=List[str])
-def read_countries(db: Session = Depends(get_db)):
+def read_countries(request: Request, response: Response, db: Session = Depends(get_db)):
     countries = crud.get_unique_countries(db)
-    # countries is a list of tuples (country,)
-    return [c[0] for c in countries if c[0]]
+    etag = http_cache.make_etag("countries", countries)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    http_cache.set_cache_headers(response, etag)
+    return countries
+
+@router.get("/facets", response_model=schemas.RecipeFacets)
+def read_facets(request: Request, response: Response, db: Session = Depends(get_db)):
+    result = crud.get_recipe_facets(db)
+    etag = http_cache.make_etag("facets", sorted((k, sorted(v.items())) for k, v in result.items()))
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    http_cache.set_cache_headers(response, etag)
+    return result
 
 @router.post("/", response_model=schemas.Recipe)
 def create_recipe(
     recipe: schemas.RecipeCreate, 
     db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_principal)
 ):
     # Validar propiedad del recetario si se proporciona
     if recipe.cookbook_id:
-        cookbook = crud.get_cookbook(db, recipe.cookbook_id)
-        if not cookbook:
+        owner_id = crud.get_cookbook_owner_id(db, recipe.cookbook_id)
+        if owner_id is None:
              raise HTTPException(status_code=404, detail="Cookbook not found")
-        if cookbook.owner_id != current_user.id:
+        if owner_id != current_user.id:
              raise HTTPException(status_code=403, detail="You can only add recipes to your own cookbooks")
              
     return crud.create_recipe(db=db, recipe=recipe, user_id=current_user.id)
 
-@router.get("/", response_model=List[schemas.Recipe])
-def read_recipes(
+@router.get("/", response_model=Union[List[schemas.Recipe], schemas.RecipePage])
+async def read_recipes(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     country: Optional[str] = None, 
     type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    paginate: str = "offset",
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    db: ReadSession = Depends(get_read_db)
 ):
-    recipes = crud.get_recipes(db, skip=skip, limit=limit, country=country, type=type)
+    # 304 antes de cargar y serializar la página si el conjunto no cambió
+    etag = http_cache.make_etag(
+        "recipes", await crud_async.get_list_version(db, "recipes"), http_cache.list_window(),
+        country, type, skip, limit, paginate, cursor, sort,
+    )
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+
+    if serializers.FAST_SERIALIZATION:
+        # Columnas -> dicts -> orjson, sin objetos ORM ni validación pydantic
+        if paginate == "cursor" or cursor:
+            items, next_cursor = await crud_async.get_recipe_rows_page(db, cursor=cursor, limit=limit, country=country, type=type)
+            content = {"items": items, "next_cursor": next_cursor}
+        else:
+            content = await crud_async.get_recipe_rows(db, skip=skip, limit=limit, country=country, type=type, sort=sort)
+        return serializers.json_response(content, headers=http_cache.cache_headers(etag))
+    http_cache.set_cache_headers(response, etag)
+
+    # Modo cursor: ?paginate=cursor (primera página) o ?cursor=... (siguientes)
+    if paginate == "cursor" or cursor:
+        items, next_cursor = await crud_async.get_recipes_page(db, cursor=cursor, limit=limit, country=country, type=type)
+        return {"items": items, "next_cursor": next_cursor}
+    # ?sort=rating ordena por promedio de votos (solo en modo offset)
+    recipes = await crud_async.get_recipes(db, skip=skip, limit=limit, country=country, type=type, sort=sort)
     return recipes
 
+# Deben declararse antes de /{recipe_id}
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_recipes(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    """
+    Cuerpo NDJSON (una receta RecipeCreate por línea), leído como stream.
+    Se inserta por lotes; la respuesta lista los errores por número de línea.
+    """
+    return await bulk_import.import_ndjson(request.stream(), db, current_user.id)
+
+@router.get("/export")
+def export_recipes(
+    country: Optional[str] = None,
+    type: Optional[str] = None,
+    owner_id: Optional[int] = None,
+):
+    def generate():
+        # Sesión propia: vive mientras dura el stream, no solo el handler
+        db = SessionLocal()
+        try:
+            yield from serializers.ndjson_chunks(
+                crud.export_recipes(db, country=country, type=type, owner_id=owner_id)
+            )
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="recipes.ndjson"'},
+    )
+
+@router.get("/by-ingredients", response_model=List[schemas.IngredientMatch])
+def recipes_by_ingredients(
+    ingredients: List[str] = Query(...),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    return crud.find_recipes_by_ingredients(db, ingredients, limit=limit)
+
+@router.get("/search", response_model=schemas.RecipePage)
+def search_recipes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    items, next_cursor = search.search_recipes(db, q=q, limit=limit, cursor=cursor)
+    return {"items": items, "next_cursor": next_cursor}
+
 @router.get("/{recipe_id}", response_model=schemas.Recipe)
-def read_recipe(recipe_id: int, db: Session = Depends(get_db)):
-    db_recipe = crud.get_recipe(db, recipe_id=recipe_id)
-    if db_recipe is None:
+async def read_recipe(recipe_id: int, request: Request, response: Response, db: ReadSession = Depends(get_read_db)):
+    version = await crud_async.get_recipe_version(db, recipe_id=recipe_id)
+    etag = http_cache.make_etag("recipe", recipe_id, version)
+    if version is not None and http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    document = await crud_async.get_recipe_document(db, recipe_id=recipe_id, version=version)
+    if document is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    return db_recipe
+    http_cache.set_cache_headers(response, etag)
+    return document
 
 @router.put("/{recipe_id}", response_model=schemas.Recipe)
 def update_recipe(
     recipe_id: int,
     recipe: schemas.RecipeCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_principal)
 ):
     db_recipe = crud.get_recipe(db, recipe_id=recipe_id)
     if db_recipe is None:
@@ -85,10 +199,10 @@ def update_recipe(
     
     # Validar propiedad del recetario si se proporciona
     if recipe.cookbook_id:
-        cookbook = crud.get_cookbook(db, recipe.cookbook_id)
-        if not cookbook:
+        owner_id = crud.get_cookbook_owner_id(db, recipe.cookbook_id)
+        if owner_id is None:
              raise HTTPException(status_code=404, detail="Cookbook not found")
-        if cookbook.owner_id != current_user.id:
+        if owner_id != current_user.id:
              raise HTTPException(status_code=403, detail="You can only add recipes to your own cookbooks")
     
     return crud.update_recipe(db=db, recipe_id=recipe_id, recipe=recipe)
@@ -97,7 +211,7 @@ def update_recipe(
 def delete_recipe(
     recipe_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.Principal = Depends(get_current_principal)
 ):
     db_recipe = crud.get_recipe(db, recipe_id=recipe_id)
     if db_recipe is None:
@@ -109,3 +223,37 @@ def delete_recipe(
     
     crud.delete_recipe(db=db, recipe_id=recipe_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# --- Ratings ---
+@router.get("/{recipe_id}/rating", response_model=schemas.RatingSummary)
+def read_recipe_rating(recipe_id: int, db: Session = Depends(get_db)):
+    summary = crud.get_rating_summary(db, "recipe", recipe_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return {"rating_count": summary.rating_count, "rating_average": summary.rating_average}
+
+@router.put("/{recipe_id}/rating", response_model=schemas.Rating)
+def rate_recipe(
+    recipe_id: int,
+    rating: schemas.RatingCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    if crud.get_rating_summary(db, "recipe", recipe_id) is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    try:
+        return crud.rate(db, "recipe", recipe_id, current_user.id, rating.score)
+    except IntegrityError:
+        # Otro request del mismo usuario votó al mismo tiempo
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Rating already being updated, retry")
+
+@router.delete("/{recipe_id}/rating", status_code=status.HTTP_204_NO_CONTENT)
+def delete_recipe_rating(
+    recipe_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_principal)
+):
+    if crud.unrate(db, "recipe", recipe_id, current_user.id) is None:
+        raise HTTPException(status_code=404, detail="Rating not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from services.storage import StorageService
+from fastapi import APIRouter, HTTPException, Request
+from starlette.datastructures import UploadFile
+from services.image_pipeline import check_content_length, ingest_upload
 
 router = APIRouter(
     prefix="/upload",
     tags=["upload"],
 )
 
-@router.post("/", response_model=dict)
-async def upload_image(file: UploadFile = File(...)):
-    if not file.content_type.startswith("image/"):
+# Multipart con un campo "file". Se parsea a mano: con `File(...)` el cuerpo se
+# recibe completo antes de poder revisar su tamaño
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"],
+    }}},
+}
+
+@router.post("/", response_model=dict, openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_image(request: Request):
+    check_content_length(request)
+    async with request.form(max_files=1, max_fields=1) as form:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="Missing file")
+        return await _upload(file)
+
+async def _upload(file: UploadFile):
+    if not (file.content_type or "").startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
     try:
@@ -16,8 +36,9 @@ async def upload_image(file: UploadFile = File(...)):
         # We can use a single bucket or the specific one. Plan said 'recetarios-images' and 'recetas-images'.
         # Since this endpoint is generic, let's stick to a default or decide based on input? 
         # For simplicity, let's use 'recetario-images' for now as defined in service default.
-        url = await StorageService.upload_image(file, bucket="recetario-images")
-        
-        return {"url": url}
+        # Devuelve la URL "detail" (compatible con image_url) y las de cada variante
+        return await ingest_upload(file, bucket="recetario-images")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,6 @@
 
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 from datetime import datetime
 
@@ -13,7 +13,7 @@ class RatingBase(BaseModel):
     score: int
 
 class RatingCreate(RatingBase):
-    pass
+    score: int = Field(..., ge=1, le=5)
 
 class Rating(RatingBase):
     id: int
@@ -24,6 +24,18 @@ class Rating(RatingBase):
     class Config:
         from_attributes = True
 
+# Agregado de votos de una receta o recetario
+class RatingSummary(BaseModel):
+    rating_count: int
+    rating_average: Optional[float] = None
+
+# Entrada del ranking "trending"
+class LeaderboardEntry(BaseModel):
+    kind: str  # 'recipe' | 'cookbook'
+    id: int
+    title: Optional[str] = None
+    score: float
+
 # Schema básico de usuario para evitar referencias circulares
 class UserBasic(BaseModel):
     id: int
@@ -33,6 +45,11 @@ class UserBasic(BaseModel):
     class Config:
         from_attributes = True
 
+# Identidad mínima del usuario autenticado (sin recetas ni recetarios)
+class Principal(BaseModel):
+    id: int
+    username: str
+
 class RecipeBase(BaseModel):
     title: str
     ingredients: List[Ingredient]
@@ -41,23 +58,47 @@ class RecipeBase(BaseModel):
     country: Optional[str] = None
     type: Optional[str] = None
     image_url: Optional[str] = None
-    cookbook_id: Optional[int] = None
     preparation_time_minutes: int = 0
     difficulty: str = "medium"
     notes: Optional[str] = None
 
 class RecipeCreate(RecipeBase):
-    pass
+    # Opcional: agrega la receta al final de este recetario (no la quita de otros)
+    cookbook_id: Optional[int] = None
 
 class Recipe(RecipeBase):
     id: int
     owner_id: int
     created_at: datetime
     owner: Optional[UserBasic] = None  # Información del autor
+    rating_count: int = 0
+    rating_average: Optional[float] = None
     
     class Config:
         from_attributes = True
 
+# Resultado de POST /recipes/bulk (NDJSON): errores por número de línea
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[BulkImportError] = []
+
+# Conteos por faceta para los filtros del Home
+class RecipeFacets(BaseModel):
+    country: Dict[str, int] = {}
+    type: Dict[str, int] = {}
+    difficulty: Dict[str, int] = {}
+
+# Resultado de búsqueda por ingredientes disponibles
+class IngredientMatch(BaseModel):
+    recipe: Recipe
+    matched: int  # Ingredientes de la consulta que la receta usa
+    missing: int  # Ingredientes de la receta que faltan
+
 class CookbookBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -74,10 +115,56 @@ class Cookbook(CookbookBase):
     created_at: datetime
     recipes: List[Recipe] = []
     owner: Optional[UserBasic] = None  # Información del autor
+    rating_count: int = 0
+    rating_average: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+# PATCH /cookbooks/{id}/recipes: add/remove incrementales o replace completo
+class CookbookMembershipUpdate(BaseModel):
+    add: List[int] = []
+    remove: List[int] = []
+    replace: Optional[List[int]] = None
+
+class CookbookMembershipResult(BaseModel):
+    added: List[int]
+    removed: List[int]
+
+# Vista compacta de recetario (?view=summary): sin recetas anidadas
+class CookbookSummary(CookbookBase):
+    id: int
+    owner_id: int
+    created_at: datetime
+    owner: Optional[UserBasic] = None
+    # Sin default: un Cookbook ORM no debe validar como resumen
+    recipe_count: int
+    recipe_titles: List[str]
 
     class Config:
         from_attributes = True
 
+# Páginas para la paginación por cursor (keyset)
+class RecipePage(BaseModel):
+    items: List[Recipe]
+    next_cursor: Optional[str] = None
+
+class CookbookPage(BaseModel):
+    items: List[Cookbook]
+    next_cursor: Optional[str] = None
+
+class CookbookSummaryPage(BaseModel):
+    items: List[CookbookSummary]
+    next_cursor: Optional[str] = None
+
+# Estado de un job de render de PDF
+class PDFJob(BaseModel):
+    job_id: str
+    cookbook_id: int
+    status: str  # 'pending' | 'running' | 'done' | 'failed'
+    url: Optional[str] = None
+    error: Optional[str] = None
+
 class UserBase(BaseModel):
     username: str
     email: str
@@ -96,9 +183,16 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # Segundos de vida del access token
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
+    token_version: Optional[int] = None
 
 # Resolver referencias circulares
 Recipe.model_rebuild()
@@ -0,0 +1,81 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, joinedload
+
+import models
+from pagination import encode_rank_cursor, decode_rank_cursor
+
+# Búsqueda full-text de recetas sobre título, ingredientes, notas e instrucciones.
+# - Postgres: columna tsvector generada (diccionario español) con índice GIN,
+#   más trigramas sobre el título para tolerar errores de tipeo.
+# - SQLite (fallback local): tabla virtual FTS5 mantenida por triggers.
+# En ambos casos el índice se mantiene en la base, no en crud; se crea con la
+# migración migrations/0002_recipe_search.py.
+
+# Postgres: relevancia full-text + similitud de trigramas del título
+_POSTGRES_SEARCH = """
+SELECT id, rank FROM (
+    SELECT r.id,
+           (ts_rank_cd(r.search_vector, query) + similarity(r.title, :q))::float8 AS rank
+    FROM recipes r, websearch_to_tsquery('spanish', :q) query
+    WHERE r.search_vector @@ query OR r.title % :q
+) ranked
+{keyset}
+ORDER BY rank DESC, id DESC
+LIMIT :limit
+"""
+
+# SQLite: bm25 (menor es mejor), se invierte para ordenar igual que en Postgres
+_SQLITE_SEARCH = """
+SELECT id, rank FROM (
+    SELECT rowid AS id, -bm25(recipes_fts, 10.0, 5.0, 2.0, 1.0) AS rank
+    FROM recipes_fts
+    WHERE recipes_fts MATCH :q
+) ranked
+{keyset}
+ORDER BY rank DESC, id DESC
+LIMIT :limit
+"""
+
+_KEYSET = "WHERE rank < :cursor_rank OR (rank = :cursor_rank AND id < :cursor_id)"
+
+
+def is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def _fts5_query(q: str) -> str:
+    # Cada palabra como término entre comillas con prefijo: evita la sintaxis de FTS5
+    words = re.findall(r"\w+", q, re.UNICODE)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_recipes(db: Session, q: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[models.Recipe], Optional[str]]:
+    """Recetas ordenadas por relevancia con paginación por cursor (rank, id)."""
+    if is_postgres(db.get_bind()):
+        sql, query_text = _POSTGRES_SEARCH, q.strip()
+    else:
+        sql, query_text = _SQLITE_SEARCH, _fts5_query(q)
+    if not query_text:
+        return [], None
+
+    params = {"q": query_text, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["cursor_rank"], params["cursor_id"] = decode_rank_cursor(cursor)
+        keyset = _KEYSET
+
+    rows = db.execute(text(sql.format(keyset=keyset)), params).all()
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_rank_cursor(page[-1].rank, page[-1].id)
+
+    ids = [row.id for row in page]
+    if not ids:
+        return [], next_cursor
+    recipes = db.query(models.Recipe).options(joinedload(models.Recipe.owner)).filter(models.Recipe.id.in_(ids)).all()
+    by_id = {r.id: r for r in recipes}
+    return [by_id[i] for i in ids if i in by_id], next_cursor
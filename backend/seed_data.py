@@ -1,20 +1,17 @@
 
-from .database import SessionLocal, engine, Base
-from . import models, schemas, crud
+from database import SessionLocal
+import models, schemas, crud, migrate
 import random
 
-# Crear tablas si no existen (esto reinicia la db si se borró el archivo)
-models.Base.metadata.drop_all(bind=engine)
-models.Base.metadata.create_all(bind=engine)
+# Crea o actualiza el esquema con las migraciones (no borra datos existentes).
+# Base local: no hay instancias viejas, así que van también las post-deploy
+migrate.upgrade(post_deploy=True)
 
 def seed():
     db = SessionLocal()
     try:
-        # Verificar si ya hay datos
-        if db.query(models.User).count() > 0:
-            print("La base de datos ya contiene datos. Saltando seed.")
-            return
-
+        # Se puede correr más de una vez: lo que ya existe (mismo usuario, o
+        # misma receta/recetario del mismo autor) se reutiliza en vez de crearse
         print("Iniciando carga de datos...")
 
         # --- USUARIOS ---
@@ -26,10 +23,14 @@ def seed():
 
         created_users = []
         for u in users_data:
-            user_in = schemas.UserCreate(username=u["username"], email=u["email"], password=u["password"])
-            user = crud.create_user(db, user_in)
+            user = crud.get_user_by_username(db, u["username"])
+            if user is not None:
+                print(f"Usuario existente: {user.username}")
+            else:
+                user_in = schemas.UserCreate(username=u["username"], email=u["email"], password=u["password"])
+                user = crud.create_user(db, user_in)
+                print(f"Usuario creado: {user.username}")
             created_users.append(user)
-            print(f"Usuario creado: {user.username}")
 
         # --- RECETAS ---
         # ChefJulia (Alta cocina, imágenes bonitas)
@@ -154,6 +155,12 @@ def seed():
         def add_recipes(user, recipes_list):
             created = []
             for r_data in recipes_list:
+                existing = db.query(models.Recipe).filter(
+                    models.Recipe.owner_id == user.id, models.Recipe.title == r_data["title"]
+                ).first()
+                if existing is not None:
+                    created.append(existing)
+                    continue
                 recipe_in = schemas.RecipeCreate(
                     title=r_data["title"],
                     country=r_data.get("country"),
@@ -176,42 +183,45 @@ def seed():
         rose_recipes = add_recipes(created_users[2], recipes_rose)
 
         # --- RECETARIOS ---
-        
+        def add_cookbook(user, cookbook_in):
+            existing = db.query(models.Cookbook).filter(
+                models.Cookbook.owner_id == user.id, models.Cookbook.title == cookbook_in.title
+            ).first()
+            if existing is not None:
+                return existing
+            cookbook = crud.create_cookbook(db, cookbook_in, user.id)
+            print(f"Recetario creado: {cookbook.title} (Autor: {user.username})")
+            return cookbook
+
         # Julia hace un recetario de "Clásicos Franceses"
-        cookbook_julia = crud.create_cookbook(
-            db, 
+        cookbook_julia = add_cookbook(
+            created_users[0],
             schemas.CookbookCreate(
                 title="Mis Clásicos Franceses", 
                 description="Una colección de mis platos favoritos de la cocina francesa.",
                 recipe_ids=[julia_recipes[0].id, julia_recipes[1].id]
-            ), 
-            created_users[0].id
+            ),
         )
-        print(f"Recetario creado: {cookbook_julia.title} (Autor: ChefJulia)")
 
         # Gordon hace un recetario "Cena Express" (solo 1 receta)
-        cookbook_gordon = crud.create_cookbook(
-            db,
+        cookbook_gordon = add_cookbook(
+            created_users[1],
             schemas.CookbookCreate(
                 title="Cena en 10 Minutos",
                 description="Para cuando no tienes tiempo que perder.",
                 recipe_ids=[gordon_recipes[0].id]
             ),
-            created_users[1].id
         )
-        print(f"Recetario creado: {cookbook_gordon.title} (Autor: GordonB)")
         
         # Rose hace un recetario de "Postres de la Abuela"
-        cookbook_rose = crud.create_cookbook(
-            db,
+        cookbook_rose = add_cookbook(
+            created_users[2],
             schemas.CookbookCreate(
                 title="Dulces Recuerdos",
                 description="Recetas que he horneado para mis nietos durante años.",
                 recipe_ids=[rose_recipes[0].id, rose_recipes[1].id]
             ),
-            created_users[2].id
         )
-        print(f"Recetario creado: {cookbook_rose.title} (Autor: GrandmaRose)")
 
         print("--- Carga de datos completada exitosamente ---")
 
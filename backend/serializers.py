@@ -0,0 +1,140 @@
+import os
+from typing import Dict, Iterable, Iterator, List
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+
+import models
+
+# Serialización rápida para listados: se seleccionan solo las columnas que usa
+# schemas.Recipe / schemas.Cookbook y se arman los dicts a mano, sin instanciar
+# objetos ORM ni validar con pydantic datos que acabamos de leer de nuestra base.
+# La respuesta se codifica con orjson. FAST_SERIALIZATION=0 vuelve al camino ORM.
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1") == "1"
+
+RECIPE_COLUMNS = (
+    models.Recipe.id,
+    models.Recipe.title,
+    models.Recipe.ingredients,
+    models.Recipe.instructions,
+    models.Recipe.instructions_format,
+    models.Recipe.country,
+    models.Recipe.type,
+    models.Recipe.image_url,
+    models.Recipe.preparation_time_minutes,
+    models.Recipe.difficulty,
+    models.Recipe.notes,
+    models.Recipe.owner_id,
+    models.Recipe.created_at,
+    models.Recipe.rating_sum,
+    models.Recipe.rating_count,
+)
+
+COOKBOOK_COLUMNS = (
+    models.Cookbook.id,
+    models.Cookbook.title,
+    models.Cookbook.description,
+    models.Cookbook.owner_id,
+    models.Cookbook.created_at,
+    models.Cookbook.rating_sum,
+    models.Cookbook.rating_count,
+)
+
+OWNER_COLUMNS = (
+    models.User.id.label("owner_user_id"),
+    models.User.username.label("owner_username"),
+    models.User.email.label("owner_email"),
+)
+
+
+def recipe_rows_query(db: Session):
+    return db.query(*RECIPE_COLUMNS, *OWNER_COLUMNS).outerjoin(
+        models.User, models.User.id == models.Recipe.owner_id
+    )
+
+
+def cookbook_rows_query(db: Session):
+    return db.query(*COOKBOOK_COLUMNS, *OWNER_COLUMNS).outerjoin(
+        models.User, models.User.id == models.Cookbook.owner_id
+    )
+
+
+def _owner(row):
+    if row.owner_user_id is None:
+        return None
+    return {"id": row.owner_id, "username": row.owner_username, "email": row.owner_email}
+
+
+def _average(row):
+    return row.rating_sum / row.rating_count if row.rating_count else None
+
+
+def recipe_row(row) -> dict:
+    """Fila de recipe_rows_query -> dict con la forma de schemas.Recipe."""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "ingredients": row.ingredients or [],
+        "instructions": row.instructions,
+        "instructions_format": row.instructions_format,
+        "country": row.country,
+        "type": row.type,
+        "image_url": row.image_url,
+        "preparation_time_minutes": row.preparation_time_minutes,
+        "difficulty": row.difficulty,
+        "notes": row.notes,
+        "owner_id": row.owner_id,
+        "created_at": row.created_at,
+        "owner": _owner(row),
+        "rating_count": row.rating_count,
+        "rating_average": _average(row),
+    }
+
+
+def cookbook_rows(db: Session, rows) -> List[dict]:
+    """Filas de cookbook_rows_query -> dicts de schemas.Cookbook, con sus recetas en orden (una consulta)."""
+    ids = [row.id for row in rows]
+    recipes: Dict[int, List[dict]] = {}
+    if ids:
+        membership = models.CookbookRecipe
+        recipe_query = (
+            db.query(membership.cookbook_id.label("member_of"), *RECIPE_COLUMNS, *OWNER_COLUMNS)
+            .join(models.Recipe, models.Recipe.id == membership.recipe_id)
+            .outerjoin(models.User, models.User.id == models.Recipe.owner_id)
+            .filter(membership.cookbook_id.in_(ids))
+            .order_by(membership.cookbook_id, membership.position, membership.recipe_id)
+        )
+        for recipe in recipe_query:
+            recipes.setdefault(recipe.member_of, []).append(recipe_row(recipe))
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "description": row.description,
+            "owner_id": row.owner_id,
+            "created_at": row.created_at,
+            "recipes": recipes.get(row.id, []),
+            "owner": _owner(row),
+            "rating_count": row.rating_count,
+            "rating_average": _average(row),
+        }
+        for row in rows
+    ]
+
+
+def json_response(content, headers: Dict[str, str] = None) -> ORJSONResponse:
+    return ORJSONResponse(content, headers=headers)
+
+
+def ndjson_chunks(documents: Iterable[dict], chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """Una línea JSON por documento, agrupadas en bloques de ~chunk_bytes para el stream."""
+    buffer = bytearray()
+    for document in documents:
+        buffer += orjson.dumps(document)
+        buffer += b"\n"
+        if len(buffer) >= chunk_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Caché read-through de documentos serializados (schemas.Recipe / schemas.Cookbook).
+# Backend "memory" (por defecto, LRU con TTL y presupuesto de bytes), "redis"
+# (compartido entre workers) o "off". "fakeredis" sirve como sustituto de Redis
+# en pruebas locales.
+DOCUMENT_CACHE_BACKEND = os.getenv("DOCUMENT_CACHE_BACKEND", "memory")
+DOCUMENT_CACHE_TTL_SECONDS = int(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", 300))
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", 10000))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryBackend:
+    """LRU en proceso con expiración por entrada y límite total de bytes."""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES, max_entries: int = DOCUMENT_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while self._data and (self._bytes > self.max_bytes or len(self._data) > self.max_entries):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _pop(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class RedisBackend:
+    """Backend compatible con Redis (redis-py o fakeredis), con expiración nativa."""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "recetario:doc:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def info(self) -> dict:
+        return {}
+
+
+def create_backend(kind: str = DOCUMENT_CACHE_BACKEND):
+    if kind == "off":
+        return None
+    if kind == "redis":
+        import redis  # Dependencia opcional
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+    if kind == "fakeredis":
+        import fakeredis  # Solo para pruebas
+        return RedisBackend(fakeredis.FakeRedis())
+    return MemoryBackend()
+
+
+class DocumentCache:
+    """
+    get_or_load(kind, id, version, loader): devuelve el documento (dict JSON)
+    desde la caché o llama a loader() (un modelo pydantic o None) y lo guarda.
+
+    `version` es la misma que arma el ETag, leída antes de cargar. Cada entrada
+    guarda su versión y solo sirve si coincide: otro worker con una entrada
+    vieja en memoria, o una carga que compitió con una invalidación, no puede
+    devolver un cuerpo viejo bajo el ETag nuevo. invalidate() (crud, después
+    del commit) solo libera la entrada antes de que expire.
+    """
+
+    def __init__(self, backend=None, ttl: int = DOCUMENT_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind: str, id: int) -> str:
+        return f"{kind}:{id}"
+
+    @staticmethod
+    def version_tag(version) -> bytes:
+        return hashlib.sha1(repr(version).encode("utf-8")).hexdigest()[:20].encode("ascii")
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get_or_load(self, kind: str, id: int, version, loader: Callable):
+        if self.backend is None:
+            document = loader()
+            return document.model_dump(mode="json") if document is not None else None
+
+        key = self.key(kind, id)
+        tag = self.version_tag(version)
+        try:
+            raw = self.backend.get(key)
+        except Exception:
+            # Si Redis no responde se sirve desde la base de datos
+            logger.exception("Document cache read failed")
+            self._count("errors")
+            raw = None
+        if raw is not None:
+            # Entrada = "<versión>\n<json>"; con otra versión cuenta como fallo
+            stored_tag, _, body = raw.partition(b"\n")
+            if stored_tag == tag:
+                self._count("hits")
+                return json.loads(body)
+
+        self._count("misses")
+        document = loader()
+        if document is None:
+            return None
+        body = document.model_dump_json().encode("utf-8")
+        try:
+            self.backend.set(key, tag + b"\n" + body, self.ttl)
+        except Exception:
+            logger.exception("Document cache write failed")
+            self._count("errors")
+        return json.loads(body)
+
+    def invalidate(self, kind: str, *ids):
+        if self.backend is None:
+            return
+        keys = [self.key(kind, id) for id in ids if id is not None]
+        if not keys:
+            return
+        try:
+            self.backend.delete(*keys)
+        except Exception:
+            logger.exception("Document cache invalidation failed")
+            self._count("errors")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, errors = self.hits, self.misses, self.errors
+        total = hits + misses
+        stats = {
+            "backend": self.backend.name if self.backend is not None else "off",
+            "hits": hits,
+            "misses": misses,
+            "errors": errors,
+            "hit_ratio": hits / total if total else None,
+        }
+        if self.backend is not None:
+            stats.update(self.backend.info())
+        return stats
+
+
+document_cache = DocumentCache(create_backend())
@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Descarga de imágenes para los PDFs: sesión con pool de conexiones,
+# descargas en paralelo con concurrencia acotada y caché LRU por tamaño.
+IMAGE_FETCH_CONCURRENCY = int(os.getenv("IMAGE_FETCH_CONCURRENCY", 8))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", 10))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Lado mayor en píxeles: ~300 dpi para el ancho máximo usado en el PDF (4.5")
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 1350))
+
+
+def create_session(pool_size: int = IMAGE_FETCH_CONCURRENCY) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ImageBytesCache:
+    """LRU thread-safe de imágenes ya procesadas, acotada por bytes totales."""
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._data.get(url)
+            if data is not None:
+                self._data.move_to_end(url)
+            return data
+
+    def set(self, url: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(url, None)
+            if old is not None:
+                self._total -= len(old)
+            self._data[url] = data
+            self._total += len(data)
+            while self._total > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._total -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._total = 0
+
+
+def downscale_image(content: bytes, max_dimension: int = IMAGE_MAX_DIMENSION) -> bytes:
+    """
+    Decodifica y reduce la imagen a max_dimension (lado mayor), re-codificada como JPEG.
+    Si no se puede decodificar, devuelve el contenido original.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return content
+
+    try:
+        with Image.open(BytesIO(content)) as img:
+            if max(img.size) <= max_dimension and img.format == "JPEG":
+                return content
+            img.thumbnail((max_dimension, max_dimension))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = BytesIO()
+            img.save(out, format="JPEG", quality=85, optimize=True)
+            return out.getvalue()
+    except Exception as e:
+        print(f"Error downscaling image: {e}")
+        return content
+
+
+class ImageFetcher:
+    def __init__(self, session: requests.Session = None, cache: ImageBytesCache = None,
+                 concurrency: int = IMAGE_FETCH_CONCURRENCY, timeout: float = IMAGE_FETCH_TIMEOUT):
+        self.session = session or create_session(concurrency)
+        self.cache = cache if cache is not None else ImageBytesCache()
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Imagen procesada (bytes) desde la caché o la red; None si falla."""
+        if not url:
+            return None
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Error downloading image {url}: {e}")
+            return None
+        data = downscale_image(response.content)
+        self.cache.set(url, data)
+        return data
+
+    def prefetch(self, urls: Iterable[str]) -> Dict[str, bytes]:
+        """Descarga en paralelo todas las URLs (sin repetir) y devuelve url -> bytes."""
+        unique = [u for u in dict.fromkeys(urls) if u]
+        if not unique:
+            return {}
+        workers = max(1, min(self.concurrency, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(self.fetch, unique)
+            return {url: data for url, data in zip(unique, results) if data is not None}
+
+
+image_fetcher = ImageFetcher()
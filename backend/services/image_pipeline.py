@@ -0,0 +1,101 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+
+from services.image_variants import IMAGE_VARIANTS, DEFAULT_VARIANT, variant_path
+from services.storage import StorageService
+
+# Ingesta de imágenes: límite de tamaño por Content-Length antes de recibir el
+# cuerpo, decodificación y variantes fuera del event loop, y subida de todas las
+# variantes bajo una clave.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+# Margen del cuerpo multipart sobre el archivo (boundaries, headers de la parte)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 4))
+
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-pipeline")
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Image exceeds {max_bytes // (1024 * 1024)} MB limit")
+
+
+def check_content_length(request: Request, max_bytes: Optional[int] = None):
+    """
+    Rechaza el upload antes de leer el cuerpo: con `File(...)` Starlette ya lo
+    habría recibido y guardado completo. El servidor ASGI no entrega más bytes
+    que los declarados en Content-Length, así que el límite no se puede evadir.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    length = request.headers.get("content-length")
+    if length is None:
+        raise HTTPException(status_code=411, detail="Content-Length required")
+    try:
+        length = int(length)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if length > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise _too_large(max_bytes)
+
+
+def upload_source(file: UploadFile, max_bytes: Optional[int] = None) -> BinaryIO:
+    """El spool del propio UploadFile, rebobinado (sin copiarlo a otro archivo)."""
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    source = file.file
+    source.seek(0, os.SEEK_END)
+    if source.tell() > max_bytes:
+        raise _too_large(max_bytes)
+    source.seek(0)
+    return source
+
+
+def build_variants(source) -> Dict[str, bytes]:
+    """Decodifica una vez y genera cada variante como JPEG. Corre en image_executor."""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            variants = {}
+            # De mayor a menor, reduciendo desde la variante anterior
+            for name, max_dimension in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+                img.thumbnail((max_dimension, max_dimension))
+                out = BytesIO()
+                img.save(out, format="JPEG", quality=85, optimize=True, progressive=True)
+                variants[name] = out.getvalue()
+            return variants
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
+
+def upload_variants(variants: Dict[str, bytes], bucket: str) -> Dict[str, str]:
+    key = uuid.uuid4().hex
+    return {
+        name: StorageService.upload_file(
+            file=data,
+            bucket=bucket,
+            path=variant_path(key, name),
+            content_type="image/jpeg",
+        )
+        for name, data in variants.items()
+    }
+
+
+async def ingest_upload(file: UploadFile, bucket: str = "recetario-images") -> dict:
+    """
+    Pipeline completo para un UploadFile. Retorna {"url": <detail>, "variants": {...}}.
+    El decode/encode y la llamada síncrona a Supabase corren en image_executor.
+    """
+    source = upload_source(file)
+    loop = asyncio.get_running_loop()
+    variants = await loop.run_in_executor(image_executor, build_variants, source)
+    urls = await loop.run_in_executor(image_executor, upload_variants, variants, bucket)
+    return {"url": urls[DEFAULT_VARIANT], "variants": urls}
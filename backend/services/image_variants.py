@@ -0,0 +1,32 @@
+import os
+
+# Variantes que genera el pipeline de subida, guardadas bajo una misma clave:
+#   <bucket>/<uuid>/card.jpg, <uuid>/detail.jpg, <uuid>/pdf.jpg
+# Lado mayor en píxeles de cada variante.
+IMAGE_VARIANTS = {
+    "card": int(os.getenv("IMAGE_VARIANT_CARD", 640)),
+    "detail": int(os.getenv("IMAGE_VARIANT_DETAIL", 1600)),
+    "pdf": int(os.getenv("IMAGE_VARIANT_PDF", 1350)),
+}
+
+# La URL que se guarda en Recipe.image_url es la de la variante "detail"
+DEFAULT_VARIANT = "detail"
+
+
+def variant_path(key: str, variant: str) -> str:
+    return f"{key}/{variant}.jpg"
+
+
+def variant_url(url: str, variant: str) -> str:
+    """
+    URL de otra variante a partir de la URL guardada. Las imágenes que no vienen
+    del pipeline (URLs externas o subidas antiguas) se devuelven sin cambios.
+    """
+    if not url:
+        return url
+    base, _, query = url.partition("?")
+    suffix = f"/{DEFAULT_VARIANT}.jpg"
+    if not base.endswith(suffix):
+        return url
+    new_base = base[: -len(suffix)] + f"/{variant}.jpg"
+    return f"{new_base}?{query}" if query else new_base
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import threading
+import uuid
+from typing import BinaryIO, Iterator, Optional
+
+# Caché local en disco de PDFs renderizados, indexada por hash de contenido.
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "recetario-pdf-cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+PDF_CHUNK_SIZE = 64 * 1024  # Bloques del stream de descarga
+
+
+class PDFDiskCache:
+    """
+    LRU en disco con límite de tamaño total. Cada entrada es un archivo <hash>.pdf
+    y el orden de uso es su mtime (se actualiza en cada lectura). El directorio
+    es el único estado: con varios workers todos ven las mismas entradas y el
+    límite se aplica sobre lo que realmente hay en disco.
+
+    Las entradas se entregan ya abiertas: un desalojo (de este u otro proceso)
+    borra el nombre del archivo, no el contenido de un handle abierto.
+    """
+
+    def __init__(self, directory: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """PDF cacheado abierto para lectura, o None. Marca la entrada como usada recientemente."""
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f
+
+    def get(self, key: str) -> Optional[bytes]:
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def tmp_path(self, key: str) -> str:
+        """Ruta temporal (mismo directorio) donde el render puede escribir antes de commit()."""
+        return f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+
+    def commit(self, key: str, tmp_path: str) -> BinaryIO:
+        """Mueve de forma atómica un archivo temporal a la caché, aplica el desalojo y devuelve el PDF abierto."""
+        f = open(tmp_path, "rb")
+        try:
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            f.close()
+            raise
+        self._evict(keep=key)
+        return f
+
+    def discard(self, tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    def put(self, key: str, pdf_bytes: bytes):
+        """Guarda el PDF de forma atómica y aplica el desalojo por tamaño."""
+        tmp_path = self.tmp_path(key)
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        self.commit(key, tmp_path).close()
+
+    def _evict(self, keep: Optional[str] = None):
+        # Tamaños y orden leídos del directorio, así cuentan los PDFs de todos los workers
+        with self._lock:
+            files = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".pdf") or name == f"{keep}.pdf":
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # Desalojado por otro worker
+                files.append((stat.st_mtime, name, stat.st_size))
+            total = sum(size for _, _, size in files)
+            if keep is not None:
+                try:
+                    total += os.path.getsize(self._path(keep))
+                except OSError:
+                    pass
+            files.sort()
+            # Sin `keep` se conserva al menos la entrada más reciente
+            candidates = files if keep is not None else files[:-1]
+            for _, name, size in candidates:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                total -= size
+
+
+def iter_file(f: BinaryIO, chunk_size: int = PDF_CHUNK_SIZE) -> Iterator[bytes]:
+    """Lee un archivo abierto en bloques de tamaño fijo y lo cierra al terminar."""
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def file_size(f: BinaryIO) -> int:
+    return os.fstat(f.fileno()).st_size
+
+
+pdf_cache = PDFDiskCache()
@@ -0,0 +1,246 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Optional
+
+from database import SessionLocal
+import models
+from pdf_generator import render_cookbook_pdf_data, render_recipe_pdf_data
+from services.pdf_cache import pdf_cache
+from services.storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+# Render de PDFs fuera del worker HTTP: ReportLab es CPU-bound y bloquea el GIL.
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PDF_JOB_RETENTION_SECONDS = float(os.getenv("PDF_JOB_RETENTION_SECONDS", 3600))
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class PDFJob:
+    def __init__(self, job_id: str, cookbook_id: int, fingerprint: str):
+        self.job_id = job_id
+        self.cookbook_id = cookbook_id
+        self.fingerprint = fingerprint
+        self.status = JOB_PENDING
+        self.url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "cookbook_id": self.cookbook_id,
+            "status": self.status,
+            "url": self.url,
+            "error": self.error,
+        }
+
+
+class PDFRenderService:
+    """
+    Pool de procesos para el render y registro en memoria de jobs de recetarios.
+    Un job por recetario y hash de contenido; recetarios distintos con el mismo
+    contenido comparten un solo render y cada uno recibe su pdf_url.
+    El estado de los jobs es por proceso: con varios workers HTTP, el cliente
+    debe consultar el mismo worker o usar la URL final guardada en el recetario.
+    """
+
+    def __init__(self, max_workers: int = PDF_RENDER_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        # El upload y la escritura en DB se hacen fuera del hilo de callbacks del pool
+        self._finalizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-finalize")
+        self._jobs = {}
+        self._in_flight = {}  # (cookbook_id, fingerprint) -> job_id
+        self._renders = {}  # fingerprint -> jobs que esperan ese render
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _discard_broken_executor(self, error: Exception):
+        # Un proceso del pool murió: el próximo render crea un pool nuevo
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                executor, self._executor = self._executor, None
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Render síncrono (el hilo espera, pero el CPU trabaja en otro proceso) ---
+    # El proceso de render escribe en un archivo temporal de la caché y se hace
+    # commit con un rename: el PDF nunca se copia entre procesos ni a memoria.
+    # Se devuelve abierto, así un desalojo inmediato no lo borra bajo los pies.
+    def _render_to_cache(self, render_fn, data: dict, author_name: str, fingerprint: str) -> BinaryIO:
+        tmp_path = pdf_cache.tmp_path(fingerprint)
+        try:
+            self.executor.submit(render_fn, data, author_name, tmp_path).result()
+            return pdf_cache.commit(fingerprint, tmp_path)
+        except Exception as e:
+            pdf_cache.discard(tmp_path)
+            self._discard_broken_executor(e)
+            raise
+
+    def render_recipe(self, recipe_data: dict, author_name: str, fingerprint: str) -> BinaryIO:
+        """Renderiza la receta y retorna el PDF de la caché, abierto."""
+        return self._render_to_cache(render_recipe_pdf_data, recipe_data, author_name, fingerprint)
+
+    def render_cookbook(self, cookbook_data: dict, author_name: str, fingerprint: str) -> BinaryIO:
+        """Renderiza el recetario y retorna el PDF de la caché, abierto."""
+        return self._render_to_cache(render_cookbook_pdf_data, cookbook_data, author_name, fingerprint)
+
+    # --- Jobs asíncronos de recetarios ---
+    def submit_cookbook_job(self, cookbook_id: int, cookbook_data: dict, author_name: str, fingerprint: str) -> PDFJob:
+        with self._lock:
+            self._prune()
+            job_id = self._in_flight.get((cookbook_id, fingerprint))
+            if job_id is not None:
+                return self._jobs[job_id]
+            job = PDFJob(uuid.uuid4().hex, cookbook_id, fingerprint)
+            self._jobs[job.job_id] = job
+            self._in_flight[(cookbook_id, fingerprint)] = job.job_id
+            waiting = self._renders.get(fingerprint)
+            if waiting is not None:
+                # Mismo contenido ya en render (otro recetario): se espera ese
+                job.status = JOB_RUNNING
+                waiting.append(job)
+                return job
+            self._renders[fingerprint] = [job]
+
+        cached = pdf_cache.open(fingerprint)
+        if cached is not None:
+            self._finalize_waiting(fingerprint, cached)
+            return job
+
+        job.status = JOB_RUNNING
+        tmp_path = pdf_cache.tmp_path(fingerprint)
+        try:
+            future = self.executor.submit(render_cookbook_pdf_data, cookbook_data, author_name, tmp_path)
+        except Exception as e:
+            # Sin esto la clave quedaría en _in_flight y los POST siguientes esperarían para siempre
+            logger.exception("Submitting PDF render for cookbook %s failed", cookbook_id)
+            pdf_cache.discard(tmp_path)
+            self._discard_broken_executor(e)
+            for waiting in self._take_waiting(fingerprint):
+                self._fail(waiting, f"Render failed: {e}")
+            return job
+        future.add_done_callback(lambda f: self._on_rendered(fingerprint, f, tmp_path))
+        return job
+
+    def completed_job(self, cookbook_id: int, fingerprint: str, url: str) -> PDFJob:
+        """Registra un job ya resuelto (el PDF guardado sigue vigente)."""
+        job = PDFJob(uuid.uuid4().hex, cookbook_id, fingerprint)
+        job.status = JOB_DONE
+        job.url = url
+        job.finished_at = time.monotonic()
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        return job
+
+    def get_job(self, job_id: str) -> Optional[PDFJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _on_rendered(self, fingerprint: str, future, tmp_path: str):
+        try:
+            future.result()
+            pdf_file = pdf_cache.commit(fingerprint, tmp_path)
+        except Exception as e:
+            logger.exception("PDF render %s failed", fingerprint[:16])
+            pdf_cache.discard(tmp_path)
+            self._discard_broken_executor(e)
+            for job in self._take_waiting(fingerprint):
+                self._fail(job, f"Render failed: {e}")
+            return
+        self._finalize_waiting(fingerprint, pdf_file)
+
+    def _take_waiting(self, fingerprint: str):
+        with self._lock:
+            return self._renders.pop(fingerprint, [])
+
+    def _finalize_waiting(self, fingerprint: str, pdf_file: BinaryIO):
+        jobs = self._take_waiting(fingerprint)
+        self._finalizer.submit(self._finalize_all, jobs, pdf_file)
+
+    def _finalize_all(self, jobs, pdf_file: BinaryIO):
+        # Se lee una vez del handle abierto: el archivo pudo desalojarse de la caché
+        try:
+            with pdf_file:
+                pdf_bytes = pdf_file.read()
+        except OSError as e:
+            logger.exception("Reading rendered PDF failed")
+            for job in jobs:
+                self._fail(job, f"Reading PDF failed: {e}")
+            return
+        for job in jobs:
+            self._finalize(job, pdf_bytes)
+
+    def _finalize(self, job: PDFJob, pdf_bytes: bytes):
+        try:
+            filename = f"cookbook_{job.cookbook_id}_{job.fingerprint[:16]}.pdf"
+            public_url = StorageService.upload_pdf(pdf_bytes, filename)
+
+            db = SessionLocal()
+            try:
+                db.query(models.Cookbook).filter(models.Cookbook.id == job.cookbook_id).update(
+                    {"pdf_url": public_url, "pdf_hash": job.fingerprint},
+                    synchronize_session=False,
+                )
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            logger.exception("Storing PDF for job %s failed", job.job_id)
+            self._fail(job, getattr(e, "detail", None) or str(e))
+            return
+
+        with self._lock:
+            job.url = public_url
+            job.status = JOB_DONE
+            job.finished_at = time.monotonic()
+            self._in_flight.pop((job.cookbook_id, job.fingerprint), None)
+
+    def _fail(self, job: PDFJob, message: str):
+        # El error ya quedó registrado (logger.exception) donde ocurrió
+        with self._lock:
+            job.status = JOB_FAILED
+            job.error = message
+            job.finished_at = time.monotonic()
+            self._in_flight.pop((job.cookbook_id, job.fingerprint), None)
+
+    def _prune(self):
+        # Se llama con el lock tomado
+        cutoff = time.monotonic() - PDF_JOB_RETENTION_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._finalizer.shutdown(wait=False)
+
+
+pdf_render_service = PDFRenderService()
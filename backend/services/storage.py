@@ -12,7 +12,7 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and
 
 class StorageService:
     @staticmethod
-    def upload_file(file: bytes, bucket: str, path: str, content_type: str = "image/jpeg") -> str:
+    def upload_file(file: bytes, bucket: str, path: str, content_type: str = "image/jpeg", upsert: bool = False) -> str:
         """
         Uploads a file to Supabase Storage and returns the public URL.
         """
@@ -24,7 +24,7 @@ class StorageService:
             res = supabase.storage.from_(bucket).upload(
                 path=path,
                 file=file,
-                file_options={"content-type": content_type}
+                file_options={"content-type": content_type, "upsert": "true" if upsert else "false"}
             )
             
             # Get public URL
@@ -55,10 +55,12 @@ class StorageService:
     def upload_pdf(pdf_bytes: bytes, filename: str) -> str:
         """
         Helper for generated PDFs.
+        Filenames are content-addressed, so overwriting an existing path is safe.
         """
         return StorageService.upload_file(
             file=pdf_bytes,
             bucket="recetarios-pdf",
             path=filename,
-            content_type="application/pdf"
+            content_type="application/pdf",
+            upsert=True
         )
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Los módulos del backend se importan planos (import crud), como al correr uvicorn desde backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base SQLite desechable: database.py crea el engine al importarse
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='recetario-tests-'), 'test.db')}")
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre el esquema de models.py, vacío en cada test."""
+    from database import Base, SessionLocal, engine
+    import models  # noqa: F401  (registra las tablas)
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def database_url():
+    """DATABASE_URL apuntando a un archivo SQLite vacío, para correr migraciones."""
+    from database import engine
+
+    def reset():
+        engine.dispose()
+        if os.path.exists(engine.url.database):
+            os.remove(engine.url.database)
+
+    reset()
+    yield engine.url.render_as_string(hide_password=False)
+    reset()
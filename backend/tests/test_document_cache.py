@@ -0,0 +1,107 @@
+import fakeredis
+import pytest
+from pydantic import BaseModel
+
+from services.document_cache import DocumentCache, MemoryBackend, RedisBackend
+
+
+class Doc(BaseModel):
+    id: int
+    title: str
+
+
+class Loader:
+    """Cuenta las cargas y devuelve el título vigente."""
+
+    def __init__(self, title="v1"):
+        self.title = title
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return Doc(id=1, title=self.title)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def redis_cache(server):
+    return DocumentCache(RedisBackend(fakeredis.FakeRedis(server=server)))
+
+
+def test_hit_after_miss(server):
+    cache = redis_cache(server)
+    load = Loader()
+    assert cache.get_or_load("recipe", 1, 1, load) == {"id": 1, "title": "v1"}
+    assert cache.get_or_load("recipe", 1, 1, load) == {"id": 1, "title": "v1"}
+    assert load.calls == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["backend"]) == (1, 1, "redis")
+
+
+def test_new_version_reloads(server):
+    cache = redis_cache(server)
+    load = Loader()
+    cache.get_or_load("recipe", 1, 1, load)
+    load.title = "v2"
+    assert cache.get_or_load("recipe", 1, 2, load)["title"] == "v2"
+    assert cache.get_or_load("recipe", 1, 2, load)["title"] == "v2"
+    assert load.calls == 2
+
+
+def test_workers_share_redis_entries(server):
+    worker_a, worker_b = redis_cache(server), redis_cache(server)
+    load = Loader()
+    worker_a.get_or_load("cookbook", 1, 1, load)
+    assert worker_b.get_or_load("cookbook", 1, 1, load)["title"] == "v1"
+    assert load.calls == 1
+
+    # La escritura invalida desde el worker B; A ve el cambio en Redis
+    load.title = "v2"
+    worker_b.invalidate("cookbook", 1)
+    assert worker_a.get_or_load("cookbook", 1, 2, load)["title"] == "v2"
+
+
+def test_memory_worker_never_serves_stale_body():
+    # Cada worker tiene su propia memoria: la invalidación de B no llega a A
+    worker_a, worker_b = DocumentCache(MemoryBackend()), DocumentCache(MemoryBackend())
+    load = Loader()
+    worker_a.get_or_load("recipe", 1, 1, load)
+    load.title = "v2"
+    worker_b.invalidate("recipe", 1)
+    assert worker_a.get_or_load("recipe", 1, 2, load)["title"] == "v2"
+
+
+def test_loader_racing_invalidation_does_not_poison_new_version(server):
+    cache = redis_cache(server)
+    stale = Loader("v1")
+    fresh = Loader("v2")
+
+    def racing_loader():
+        # La escritura (v2) hace commit e invalida mientras esta carga leía v1
+        cache.invalidate("recipe", 1)
+        return stale()
+
+    assert cache.get_or_load("recipe", 1, 1, racing_loader)["title"] == "v1"
+    assert cache.get_or_load("recipe", 1, 2, fresh)["title"] == "v2"
+    assert cache.get_or_load("recipe", 1, 2, fresh)["title"] == "v2"
+    assert fresh.calls == 1
+
+
+def test_missing_document_is_not_cached(server):
+    cache = redis_cache(server)
+    assert cache.get_or_load("recipe", 1, None, lambda: None) is None
+    assert cache.stats()["misses"] == 1
+    assert cache.get_or_load("recipe", 1, 1, Loader())["title"] == "v1"
+
+
+def test_redis_errors_fall_back_to_loader(server):
+    cache = redis_cache(server)
+    server.connected = False
+    load = Loader()
+    assert cache.get_or_load("recipe", 1, 1, load)["title"] == "v1"
+    cache.invalidate("recipe", 1)
+    assert load.calls == 1
+    assert cache.stats()["errors"] == 3
@@ -0,0 +1,52 @@
+import crud
+import facets
+import models
+
+
+def test_blank_values_are_not_counted(db):
+    facets.invalidate()
+    facets.apply_counts(db, [
+        {"country": "Chile", "type": "Postre"},
+        {"country": "", "type": "Postre"},
+        {"country": "   ", "type": None},
+    ])
+    db.commit()
+    facets.invalidate()
+
+    assert facets.get_facets(db)["country"] == {"Chile": 1}
+    assert crud.get_unique_countries(db) == ["Chile"]
+
+
+def test_change_to_blank_decrements_old_value(db):
+    facets.apply_change(db, None, {"country": "Perú"})
+    facets.apply_change(db, {"country": "Perú"}, {"country": " "})
+    db.commit()
+    facets.invalidate()
+
+    assert facets.get_facets(db)["country"] == {}
+
+
+def test_rebuild_skips_blank_values(db):
+    db.add_all([
+        models.Recipe(title="a", country="Chile", type=""),
+        models.Recipe(title="b", country=" ", type="Fondo"),
+        models.Recipe(title="c", country="Chile", type="Fondo"),
+    ])
+    db.commit()
+
+    facets.rebuild(db.connection())
+    db.commit()
+
+    result = facets.get_facets(db)
+    assert result["country"] == {"Chile": 2}
+    assert result["type"] == {"Fondo": 2}
+    facets.invalidate()
+
+
+def test_get_facets_does_not_write_when_table_is_empty(db):
+    db.add(models.Recipe(title="a", country="Chile"))
+    db.commit()
+    facets.invalidate()
+
+    assert facets.get_facets(db)["country"] == {}
+    assert db.query(models.RecipeFacet).count() == 0
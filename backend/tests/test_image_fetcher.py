@@ -0,0 +1,140 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from services.image_fetcher import ImageBytesCache, ImageFetcher, create_session
+
+
+def _jpeg(size: int) -> bytes:
+    out = BytesIO()
+    Image.new("RGB", (size, size), (200, 80, 40)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+class ImageServer(ThreadingHTTPServer):
+    """Sirve /<lado>/<nombre> como JPEG y registra concurrencia, conexiones y pedidos."""
+
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), ImageHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.connections = set()
+        self.requests = []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive: el pool puede reutilizar la conexión
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.connections.add(self.client_address)
+            server.requests.append(self.path)
+        try:
+            time.sleep(server.delay)
+            parts = self.path.strip("/").split("/")
+            if parts[0] == "missing":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = _jpeg(int(parts[0]))
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(delay: float = 0.0) -> ImageServer:
+        server = ImageServer(delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_prefetch_bounds_concurrency(serve):
+    server = serve(delay=0.05)
+    fetcher = ImageFetcher(session=create_session(3), cache=ImageBytesCache(), concurrency=3)
+    urls = [server.url(f"/16/{i}") for i in range(12)]
+
+    images = fetcher.prefetch(urls + urls[:4])  # Las repetidas se piden una vez
+
+    assert set(images) == set(urls)
+    assert len(server.requests) == 12
+    assert 2 <= server.max_active <= 3
+
+
+def test_session_reuses_pooled_connections(serve):
+    server = serve()
+    session = create_session(2)
+    fetcher = ImageFetcher(session=session, cache=ImageBytesCache(), concurrency=2)
+
+    for i in range(5):
+        assert fetcher.fetch(server.url(f"/16/seq-{i}")) is not None
+    assert len(server.connections) == 1
+
+    fetcher.prefetch(server.url(f"/16/par-{i}") for i in range(10))
+    assert len(server.requests) == 15
+    assert len(server.connections) <= 2
+    session.close()
+
+
+def test_cache_evicts_least_recently_used_within_byte_budget(serve):
+    server = serve()
+    size = len(_jpeg(16))
+    cache = ImageBytesCache(max_bytes=2 * size)
+    fetcher = ImageFetcher(session=create_session(1), cache=cache, concurrency=1)
+    a, b, c = (server.url(f"/16/{name}") for name in "abc")
+
+    fetcher.fetch(a)
+    fetcher.fetch(b)
+    fetcher.fetch(a)  # Hit: "a" pasa a ser la más reciente
+    fetcher.fetch(c)  # Desaloja "b"
+    assert server.requests == ["/16/a", "/16/b", "/16/c"]
+    assert cache._total <= cache.max_bytes
+
+    fetcher.fetch(a)
+    fetcher.fetch(b)
+    assert server.requests == ["/16/a", "/16/b", "/16/c", "/16/b"]
+
+
+def test_failures_and_oversized_images_are_not_cached(serve):
+    server = serve()
+    cache = ImageBytesCache(max_bytes=len(_jpeg(16)))
+    fetcher = ImageFetcher(session=create_session(1), cache=cache, concurrency=1)
+
+    assert fetcher.fetch(server.url("/missing/x")) is None
+    big = server.url("/256/big")
+    assert fetcher.fetch(big) is not None
+    assert fetcher.fetch(big) is not None
+    assert server.requests == ["/missing/x", "/256/big", "/256/big"]
+    assert cache._total == 0
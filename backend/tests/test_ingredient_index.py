@@ -0,0 +1,62 @@
+import pytest
+
+import crud
+import ingredient_index
+import models
+import schemas
+
+
+@pytest.mark.parametrize("plural, singular", [
+    ("limones", "limón"),
+    ("champiñones", "champiñón"),
+    ("nueces", "nuez"),
+    ("ajíes", "ají"),
+    ("panes", "pan"),
+    ("flores", "flor"),
+    ("frijoles", "frijol"),
+    ("coles", "col"),
+    ("calabacines", "calabacín"),
+    ("tomates", "tomate"),
+    ("chiles", "chile"),
+    ("huevos", "huevo"),
+    ("carnes", "carne"),
+    ("dulces", "dulce"),
+    ("especies", "especie"),
+    ("luces", "luz"),
+    ("raíces", "raíz"),
+    ("maníes", "maní"),
+])
+def test_plural_matches_singular(plural, singular):
+    assert ingredient_index.normalize_name(plural) == ingredient_index.normalize_name(singular)
+
+
+def test_normalize_name_strips_accents_case_and_spaces():
+    assert ingredient_index.normalize_name("  Limones  Verdes ") == "limon verde"
+    assert ingredient_index.normalize_name("AZÚCAR flor") == "azucar flor"
+
+
+def test_short_words_are_kept():
+    assert ingredient_index.normalize_name("gas mes") == "gas mes"
+
+
+def test_index_keys_include_full_name_and_words():
+    keys = ingredient_index.index_keys([{"name": "Jugo de limones"}, {"name": ""}, {"name": "Sal"}])
+    assert keys == {"jugo de limon", "jugo", "limon", "sal"}
+
+
+def test_query_terms_use_index_keys_and_deduplicate():
+    assert ingredient_index.query_terms(["Limón", "limones", " ", "pimientos rojos"]) == [
+        {"limon"}, {"pimiento rojo", "pimiento", "rojo"},
+    ]
+
+
+def test_multi_word_query_matches_recipes_by_word(db):
+    db.add(models.User(id=1, username="ana"))
+    db.commit()
+    for title, names in [("Asado", ["Pimientos rojos asados", "Sal"]), ("Ensalada", ["Pimiento verde", "Tomate"])]:
+        crud.create_recipe(db, schemas.RecipeCreate(
+            title=title, ingredients=[{"name": n} for n in names], instructions="-",
+        ), user_id=1)
+
+    results = crud.find_recipes_by_ingredients(db, ["pimiento rojo", "tomates"])
+    assert [(r["recipe"].title, r["matched"]) for r in results] == [("Ensalada", 2), ("Asado", 1)]
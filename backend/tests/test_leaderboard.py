@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+
+import crud
+import leaderboard
+import models
+import schemas
+
+EPOCH = datetime.datetime(2024, 1, 1)
+
+
+def _seed(db, scores):
+    db.add(models.TrendEpoch(id=1, epoch=EPOCH))
+    for recipe_id, score in scores.items():
+        db.add(models.Recipe(id=recipe_id, title=f"Receta {recipe_id}", trend_score=score))
+    db.commit()
+
+
+def test_trend_weight_overflows_without_rescale(monkeypatch):
+    monkeypatch.setattr(leaderboard, "TREND_HALF_LIFE_HOURS", 24.0)
+    # 1024 vidas medias de 24 h después de 2024-01-01
+    at = EPOCH + datetime.timedelta(days=1025)
+    with pytest.raises(OverflowError):
+        leaderboard.trend_weight(at, EPOCH)
+    assert leaderboard.trend_weight(at, at) == 1.0
+
+
+def test_rescale_moves_epoch_and_keeps_decayed_scores(db):
+    _seed(db, {1: 3.0 * 2 ** 100, 2: 5.0 * 2 ** 100, 3: 0.0})
+    now = EPOCH + datetime.timedelta(hours=leaderboard.TREND_HALF_LIFE_HOURS * 100)
+    before = {r.id: leaderboard.decay_to_now(r.trend_score, EPOCH, now) for r in db.query(models.Recipe)}
+
+    assert leaderboard.rescale(db, now) == now
+    db.commit()
+
+    assert leaderboard.current_epoch(db) == now
+    after = {r.id: leaderboard.decay_to_now(r.trend_score, now, now) for r in db.query(models.Recipe)}
+    assert after == before == {1: 3.0, 2: 5.0, 3: 0.0}
+
+
+def test_compute_rescales_once_past_the_threshold(db, monkeypatch):
+    monkeypatch.setattr(leaderboard, "TREND_RESCALE_HALF_LIVES", 10)
+    _seed(db, {1: 2.0 ** 12, 2: 2.0 ** 11})
+    board = leaderboard.Leaderboard(size=10)
+
+    now = EPOCH + datetime.timedelta(hours=leaderboard.TREND_HALF_LIFE_HOURS * 9)
+    board.compute(db, now)
+    assert leaderboard.current_epoch(db) == EPOCH
+
+    now = EPOCH + datetime.timedelta(hours=leaderboard.TREND_HALF_LIFE_HOURS * 12)
+    snapshot = board.compute(db, now)
+    assert leaderboard.current_epoch(db) == now
+    assert [(e["id"], e["score"]) for e in snapshot["recipe"]] == [(1, 1.0), (2, 0.5)]
+    assert db.get(models.Recipe, 1).trend_score == 1.0
+
+
+def test_rebuild_uses_current_epoch_and_skips_undated_votes(db):
+    now = datetime.datetime.utcnow()
+    db.add(models.TrendEpoch(id=1, epoch=now))
+    db.add(models.User(id=1, username="a"))
+    db.add(models.User(id=2, username="b"))
+    db.add(models.Recipe(id=1, title="r", created_at=now, trend_score=123.0))
+    db.add(models.Rating(user_id=1, recipe_id=1, score=4, created_at=now))
+    db.add(models.Rating(user_id=2, recipe_id=1, score=5))
+    db.commit()
+    # Votos anteriores a ratings.created_at
+    db.query(models.Rating).filter(models.Rating.user_id == 2).update({"created_at": None})
+    db.commit()
+
+    leaderboard.rebuild_trend_scores(db, batch_size=1)
+
+    assert db.get(models.Recipe, 1).trend_score == leaderboard.TREND_CREATION_BOOST + 4
+
+
+def test_writes_with_a_stale_cached_epoch_are_corrected(db):
+    # Otro proceso reescaló: la caché de este todavía tiene la época anterior
+    now = datetime.datetime.utcnow()
+    db.add(models.TrendEpoch(id=1, epoch=now))
+    db.add(models.User(id=1, username="a"))
+    db.commit()
+    leaderboard._remember(now - datetime.timedelta(hours=leaderboard.TREND_HALF_LIFE_HOURS * 3))
+
+    recipe = crud.create_recipe(
+        db, schemas.RecipeCreate(title="r", ingredients=[], instructions="-"), user_id=1
+    )
+    assert recipe.trend_score == pytest.approx(leaderboard.TREND_CREATION_BOOST, rel=1e-3)
+    assert leaderboard.cached_epoch(db) == now
+
+    leaderboard._remember(now - datetime.timedelta(hours=leaderboard.TREND_HALF_LIFE_HOURS * 3))
+    crud.rate(db, "recipe", recipe.id, 1, 4)
+    db.refresh(recipe)
+    assert recipe.trend_score == pytest.approx(leaderboard.TREND_CREATION_BOOST + 4, rel=1e-3)
@@ -0,0 +1,59 @@
+import crud
+import migrate
+import models
+import schemas
+from database import SessionLocal
+
+
+def _recipe(**fields):
+    return schemas.RecipeCreate(title="Pebre", ingredients=[{"name": "tomate"}], instructions="Picar.", **fields)
+
+
+def _versions(db):
+    return crud.get_list_version(db, "recipes"), crud.get_list_version(db, "cookbooks")
+
+
+def test_writes_bump_the_listings_they_change(database_url):
+    migrate.upgrade(database_url, post_deploy=True)
+    db = SessionLocal()
+    try:
+        db.add(models.User(id=1, username="ana"))
+        db.add(models.User(id=2, username="beto"))
+        db.commit()
+        assert _versions(db) == (1, 1)
+
+        cookbook = crud.create_cookbook(db, schemas.CookbookCreate(title="Salsas"), user_id=1)
+        assert _versions(db) == (1, 2)
+        recipe = crud.create_recipe(db, _recipe(cookbook_id=cookbook.id), user_id=1)
+        assert _versions(db) == (2, 3)
+        loose = crud.create_recipe(db, _recipe(), user_id=1)
+        assert _versions(db) == (3, 3)
+        crud.bulk_create_recipes(db, [_recipe(), _recipe()], user_id=1)
+        assert _versions(db) == (4, 3)
+
+        # Los votos y las lecturas no cambian ninguna versión
+        crud.rate(db, "recipe", recipe.id, 2, 5)
+        crud.unrate(db, "recipe", recipe.id, 2)
+        crud.get_recipes_page(db, limit=10)
+        crud.get_cookbook(db, cookbook.id)
+        assert _versions(db) == (4, 3)
+
+        crud.change_cookbook_recipes(db, cookbook.id, 1, remove=[recipe.id])
+        assert _versions(db) == (4, 4)
+        crud.update_cookbook(db, cookbook.id, schemas.CookbookUpdate(title="Salsas chilenas"))
+        assert _versions(db) == (4, 5)
+        crud.delete_recipe(db, loose.id)
+        assert _versions(db) == (5, 5)
+        crud.delete_cookbook(db, cookbook.id)
+        assert _versions(db) == (5, 6)
+    finally:
+        db.close()
+
+
+def test_bump_creates_missing_rows(db):
+    assert _versions(db) == (None, None)
+    db.add(models.User(id=1, username="ana"))
+    db.commit()
+    crud.create_recipe(db, _recipe(), user_id=1)
+    crud.create_recipe(db, _recipe(), user_id=1)
+    assert _versions(db) == (2, None)
@@ -0,0 +1,59 @@
+import os
+
+from services.pdf_cache import PDFDiskCache, file_size, iter_file
+
+
+def _put(cache, key, size, mtime):
+    cache.put(key, b"x" * size)
+    os.utime(os.path.join(cache.directory, f"{key}.pdf"), (mtime, mtime))
+
+
+def _keys(directory):
+    return sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".pdf"))
+
+
+def test_open_handle_survives_eviction(tmp_path):
+    cache = PDFDiskCache(str(tmp_path), max_bytes=150)
+    _put(cache, "a", 100, 1)
+    pdf_file = cache.open("a")
+
+    cache.put("b", b"y" * 100)  # Desaloja "a"
+
+    assert _keys(tmp_path) == ["b"]
+    assert cache.open("a") is None
+    assert file_size(pdf_file) == 100
+    assert b"".join(iter_file(pdf_file, chunk_size=30)) == b"x" * 100
+    assert pdf_file.closed
+
+
+def test_limit_counts_files_from_every_worker(tmp_path):
+    worker_1 = PDFDiskCache(str(tmp_path), max_bytes=250)
+    worker_2 = PDFDiskCache(str(tmp_path), max_bytes=250)
+    _put(worker_1, "a", 100, 1)
+    _put(worker_2, "b", 100, 2)
+    _put(worker_1, "c", 100, 3)
+
+    assert _keys(tmp_path) == ["b", "c"]
+
+
+def test_reads_refresh_lru_order(tmp_path):
+    cache = PDFDiskCache(str(tmp_path), max_bytes=250)
+    _put(cache, "a", 100, 1)
+    _put(cache, "b", 100, 2)
+    cache.open("a").close()  # "a" pasa a ser la más reciente
+
+    cache.put("c", b"z" * 100)
+
+    assert _keys(tmp_path) == ["a", "c"]
+
+
+def test_commit_returns_open_file_and_keeps_oversized_entry(tmp_path):
+    cache = PDFDiskCache(str(tmp_path), max_bytes=10)
+    tmp = cache.tmp_path("big")
+    with open(tmp, "wb") as f:
+        f.write(b"p" * 50)
+
+    with cache.commit("big", tmp) as pdf_file:
+        assert pdf_file.read() == b"p" * 50
+    assert _keys(tmp_path) == ["big"]
+    assert not os.path.exists(tmp)
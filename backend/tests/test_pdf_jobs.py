@@ -0,0 +1,48 @@
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+from services.pdf_jobs import JOB_FAILED, JOB_RUNNING, PDFRenderService
+
+
+class BrokenExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class IdleExecutor:
+    """Acepta el render pero nunca lo termina."""
+
+    def submit(self, *args, **kwargs):
+        class Future:
+            def add_done_callback(self, callback):
+                pass
+        return Future()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_failed_submit_fails_the_job_and_clears_in_flight():
+    service = PDFRenderService(max_workers=1)
+    broken = service._executor = BrokenExecutor()
+    fingerprint = uuid.uuid4().hex
+
+    job = service.submit_cookbook_job(1, {}, "ana", fingerprint)
+
+    assert job.status == JOB_FAILED
+    assert "worker died" in job.error
+    assert service._in_flight == {} and service._renders == {}
+    assert broken.shut_down and service._executor is None
+
+    # El siguiente POST no queda pegado al job fallido
+    service._executor = IdleExecutor()
+    retry = service.submit_cookbook_job(1, {}, "ana", fingerprint)
+    assert retry.job_id != job.job_id
+    assert retry.status == JOB_RUNNING
+    service.shutdown()
@@ -0,0 +1,245 @@
+"""
+Regresión de planes de consulta: ejecuta las consultas calientes de crud contra
+una base sembrada, captura el SQL que emiten y corre EXPLAIN sobre cada
+sentencia. Falla si alguna recorre secuencialmente una tabla que debería leerse
+por índice.
+
+    pytest tests/test_query_plans.py                                 (SQLite temporal)
+    PLAN_CHECK_DATABASE_URL=postgresql://... pytest tests/test_query_plans.py
+
+El esquema se crea con las migraciones (migrate.py), así que se revisan los
+índices que realmente se despliegan. Postgres solo corre con
+PLAN_CHECK_DATABASE_URL y la base debe ser desechable (p. ej. un contenedor
+local): se borran y recrean las tablas. EXPLAIN corre con enable_seqscan=off,
+así que un "Seq Scan" solo aparece cuando no existe un índice utilizable.
+"""
+import datetime
+import json
+import os
+import random
+import re
+from typing import Callable, List, NamedTuple, Sequence
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import facets
+import ingredient_index
+import migrate
+import models
+import search
+from database import Base
+
+N_USERS = 50
+N_COOKBOOKS = 300
+N_RECIPES = 3000
+COUNTRIES = ["Chile", "Perú", "México", "Argentina", "España", "Italia"]
+TYPES = ["Entrada", "Fondo", "Postre", "Bebida"]
+INGREDIENTS = ["harina", "huevo", "leche", "azúcar", "tomate", "cebolla", "ajo", "pollo", "arroz", "papa"]
+
+
+def seed(engine, url: str):
+    if engine.dialect.name != "sqlite":
+        Base.metadata.drop_all(bind=engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
+    migrate.upgrade(url, post_deploy=True)
+    now = datetime.datetime.utcnow()
+    rnd = random.Random(11)
+    recipes = []
+    for i in range(1, N_RECIPES + 1):
+        ingredients = [{"name": name, "amount": "1", "unit": "u"} for name in rnd.sample(INGREDIENTS, 4)]
+        recipes.append({
+            "id": i,
+            "title": f"Receta {i}",
+            "ingredients": ingredients,
+            "instructions": "Mezclar.\nServir.",
+            "instructions_format": "numbered",
+            "country": rnd.choice(COUNTRIES),
+            "type": rnd.choice(TYPES),
+            "difficulty": "medium",
+            "preparation_time_minutes": 30,
+            "owner_id": (i - 1) % N_USERS + 1,
+            "created_at": now - datetime.timedelta(seconds=i),
+            "updated_at": now,
+        })
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, N_USERS + 1)
+        ])
+        conn.execute(models.Cookbook.__table__.insert(), [
+            {"id": i, "title": f"Recetario {i}", "description": "Descripción", "owner_id": (i - 1) % N_USERS + 1,
+             "created_at": now - datetime.timedelta(minutes=i), "updated_at": now}
+            for i in range(1, N_COOKBOOKS + 1)
+        ])
+        conn.execute(models.Recipe.__table__.insert(), recipes)
+        conn.execute(models.CookbookRecipe.__table__.insert(), [
+            {"cookbook_id": rnd.randint(1, N_COOKBOOKS), "recipe_id": i, "position": i}
+            for i in range(1, N_RECIPES + 1)
+        ])
+        conn.execute(models.RecipeIngredient.__table__.insert(), [
+            {"recipe_id": recipe["id"], "name": key}
+            for recipe in recipes
+            for key in ingredient_index.index_keys(recipe["ingredients"])
+        ])
+        # Un executemany por forma de fila: recipe_id y cookbook_id van por separado
+        conn.execute(models.Rating.__table__.insert(), [
+            {"score": 4, "user_id": i % N_USERS + 1, "recipe_id": i, "created_at": now}
+            for i in range(1, N_RECIPES + 1)
+        ])
+        conn.execute(models.Rating.__table__.insert(), [
+            {"score": 5, "user_id": i % N_USERS + 1, "cookbook_id": i, "created_at": now}
+            for i in range(1, N_COOKBOOKS + 1)
+        ])
+    with engine.begin() as conn:
+        facets.rebuild(conn)
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable
+    # Tablas que cada sentencia del caso debe leer por índice
+    indexed: Sequence[str]
+
+
+def _cookbook_summaries(db):
+    cookbooks, _ = crud.get_cookbooks_page(db, limit=20, depth=0)
+    return crud.summarize_cookbooks(db, cookbooks)
+
+
+def _second_recipes_page(db):
+    _, cursor = crud.get_recipes_page(db, limit=20)
+    return crud.get_recipes_page(db, cursor=cursor, limit=20)
+
+
+def _recipe_facets(db):
+    facets.invalidate()  # Sin caché: se lee la tabla agregada
+    return facets.get_facets(db)
+
+
+def _add_to_cookbook(db):
+    return crud.change_cookbook_recipes(db, 2, crud.get_cookbook_owner_id(db, 2), add=[52, 102, 152])
+
+
+# Lecturas primero; las escrituras al final porque modifican los datos sembrados
+CASES: List[Case] = [
+    Case("list version", lambda db: crud.get_list_version(db, "recipes"), ["list_versions"]),
+    Case("recipes page", lambda db: crud.get_recipes_page(db, limit=20), ["recipes", "users"]),
+    Case("recipes second page", _second_recipes_page, ["recipes", "users"]),
+    Case("recipe rows page", lambda db: crud.get_recipe_rows_page(db, limit=20), ["recipes", "users"]),
+    Case("recipes by country", lambda db: crud.get_recipes(db, country="Chile"), ["recipes"]),
+    Case("recipes by type", lambda db: crud.get_recipes(db, type="Postre"), ["recipes"]),
+    Case("recipes page by country", lambda db: crud.get_recipes_page(db, country="Chile", limit=20), ["recipes", "users"]),
+    Case("recipe rows page by type", lambda db: crud.get_recipe_rows_page(db, type="Postre", limit=20), ["recipes", "users"]),
+    Case("recipe detail", lambda db: crud.get_recipe(db, 1), ["recipes", "users"]),
+    Case("recipe version", lambda db: crud.get_recipe_version(db, 1), ["recipes"]),
+    Case("recipes of a user", lambda db: crud.get_user(db, 1).recipes, ["users", "recipes"]),
+    Case("recipes by ingredients", lambda db: crud.find_recipes_by_ingredients(db, ["harina", "huevo"]),
+         ["recipe_ingredients", "recipes", "users"]),
+    Case("search", lambda db: search.search_recipes(db, "receta", limit=20), ["recipes", "users"]),
+    Case("recipe facets", _recipe_facets, ["recipes"]),
+    # Recuenta todas las recetas a propósito (GROUP BY por faceta): solo se explica
+    Case("facets rebuild", lambda db: facets.rebuild(db.connection()), []),
+    Case("export by owner", lambda db: list(crud.export_recipes(db, owner_id=1)), ["recipes", "users"]),
+    Case("cookbooks page", lambda db: crud.get_cookbooks_page(db, limit=20),
+         ["cookbooks", "cookbook_recipes", "recipes", "users"]),
+    Case("cookbook detail", lambda db: crud.get_cookbook(db, 1), ["cookbooks", "cookbook_recipes", "recipes", "users"]),
+    Case("cookbook version", lambda db: crud.get_cookbook_version(db, 1), ["cookbooks", "cookbook_recipes", "recipes"]),
+    Case("cookbook rows page", lambda db: crud.get_cookbook_rows_page(db, limit=20),
+         ["cookbooks", "cookbook_recipes", "recipes", "users"]),
+    Case("cookbook summaries", _cookbook_summaries, ["cookbooks", "cookbook_recipes", "recipes", "users"]),
+    Case("cookbooks of a recipe", lambda db: crud.get_recipe_cookbook_ids(db, [1]), ["cookbook_recipes"]),
+    Case("cookbook owner", lambda db: crud.get_cookbook_owner_id(db, 1), ["cookbooks"]),
+    Case("owned cookbooks", lambda db: crud.owned_cookbook_ids(db, [1, 2, 3], 1), ["cookbooks"]),
+    Case("user rating", lambda db: crud.get_user_rating(db, "recipe", 1, 2), ["ratings"]),
+    Case("rating summary", lambda db: crud.get_rating_summary(db, "cookbook", 1), ["cookbooks"]),
+    Case("user by username", lambda db: crud.get_user_by_username(db, "user1"), ["users"]),
+    Case("add recipes to cookbook", _add_to_cookbook, ["cookbooks", "cookbook_recipes", "recipes"]),
+    Case("delete recipe", lambda db: crud.delete_recipe(db, 3), ["recipes", "ratings", "cookbook_recipes", "recipe_ingredients"]),
+    Case("delete cookbook", lambda db: crud.delete_cookbook(db, 3), ["cookbooks", "ratings", "cookbook_recipes"]),
+]
+
+
+class StatementLog:
+    """Listener before_cursor_execute: guarda las sentencias que se pueden explicar."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            self.statements.append((statement, parameters))
+
+
+# SQLite: "SCAN recipes" es un recorrido completo; "SCAN ... USING INDEX" y "SEARCH ..." no.
+# Los alias de SQLAlchemy (recipes_1) se reducen al nombre de la tabla.
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$")
+_ALIAS_SUFFIX = re.compile(r"_\d+$")
+
+
+def _sqlite_full_scans(conn, statement, parameters) -> List[str]:
+    scans = []
+    for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+        match = _SQLITE_SCAN.match(row[-1])
+        if match:
+            scans.append(_ALIAS_SUFFIX.sub("", match.group(1)))
+    return scans
+
+
+def _postgres_full_scans(conn, statement, parameters) -> List[str]:
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def full_scans(engine, case: Case) -> List[str]:
+    log = StatementLog()
+    event.listen(engine, "before_cursor_execute", log)
+    db = sessionmaker(bind=engine)()
+    try:
+        case.run(db)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", log)
+
+    sqlite = engine.dialect.name == "sqlite"
+    problems = []
+    with engine.connect() as conn:
+        if not sqlite:
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in log.statements:
+            for table in (_sqlite_full_scans if sqlite else _postgres_full_scans)(conn, statement, parameters):
+                if table in case.indexed:
+                    problems.append(f"full scan of {table}: {' '.join(statement.split())[:200]}")
+        conn.rollback()
+    return problems
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def plan_engine(request, tmp_path_factory):
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path_factory.mktemp('query-plans') / 'plans.db'}"
+    else:
+        url = os.getenv("PLAN_CHECK_DATABASE_URL")
+        if not url:
+            pytest.skip("PLAN_CHECK_DATABASE_URL no definida")
+    engine = create_engine(url)
+    seed(engine, url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_query_plan_uses_indexes(plan_engine, case):
+    assert full_scans(plan_engine, case) == []
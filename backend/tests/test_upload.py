@@ -0,0 +1,56 @@
+from io import BytesIO
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from routers import upload
+from services import image_pipeline
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(image_pipeline, "MAX_UPLOAD_BYTES", 100 * 1024)
+    monkeypatch.setattr(
+        image_pipeline, "upload_variants",
+        lambda variants, bucket: {name: f"https://cdn/{name}.jpg" for name in variants},
+    )
+    app = FastAPI()
+    app.include_router(upload.router)
+    return TestClient(app)
+
+
+def _png() -> bytes:
+    out = BytesIO()
+    Image.new("RGB", (64, 48), (10, 120, 30)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_upload_builds_variants_from_the_uploaded_spool(client):
+    response = client.post("/upload/", files={"file": ("a.png", _png(), "image/png")})
+    assert response.status_code == 200
+    assert response.json()["url"] == f"https://cdn/{image_pipeline.DEFAULT_VARIANT}.jpg"
+
+
+def test_oversized_content_length_is_rejected_before_parsing(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("form parsed")
+    monkeypatch.setattr("starlette.requests.Request.form", fail)
+
+    body = b"x" * (200 * 1024)
+    response = client.post("/upload/", files={"file": ("big.png", body, "image/png")})
+    assert response.status_code == 413
+
+
+def test_file_over_limit_within_multipart_margin_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(image_pipeline, "MULTIPART_OVERHEAD_BYTES", 1024 * 1024)
+    body = b"x" * (150 * 1024)
+    response = client.post("/upload/", files={"file": ("big.png", body, "image/png")})
+    assert response.status_code == 413
+
+
+def test_missing_file_and_non_images_are_rejected(client):
+    assert client.post("/upload/", data={"other": "1"}).status_code == 400
+    response = client.post("/upload/", files={"file": ("a.txt", b"hola", "text/plain")})
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+import datetime
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Revocación de access tokens sin consultar la DB en cada request: cada token
+# lleva el token_version del usuario al emitirse, y un token es válido solo si
+# esa versión sigue siendo la actual. En memoria se guarda {user_id: versión}
+# únicamente para usuarios que alguna vez revocaron (token_version > 0); se
+# sincroniza de forma incremental cada TOKEN_REVOCATION_SYNC_SECONDS usando
+# users.tokens_revoked_at. Las revocaciones hechas en este worker se aplican al
+# instante; las de otros workers, en el próximo sync.
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 30))
+# Margen para escrituras que commitean después de iniciado el sync
+_SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+
+class RevocationList:
+    def __init__(self):
+        self._versions: Dict[int, int] = {}
+        self._synced_at: Optional[datetime.datetime] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_revoked(self, user_id: int, token_version: int) -> bool:
+        with self._lock:
+            return token_version < self._versions.get(user_id, 0)
+
+    def record(self, user_id: int, token_version: int):
+        """Aplica localmente una revocación recién commiteada."""
+        with self._lock:
+            if token_version > self._versions.get(user_id, 0):
+                self._versions[user_id] = token_version
+
+    def sync(self, db: Session):
+        started = datetime.datetime.utcnow()
+        query = db.query(models.User.id, models.User.token_version).filter(models.User.token_version > 0)
+        if self._synced_at is not None:
+            query = query.filter(models.User.tokens_revoked_at >= self._synced_at - _SYNC_OVERLAP)
+        for user_id, token_version in query.all():
+            self.record(user_id, token_version)
+        self._synced_at = started
+
+    @property
+    def synced(self) -> bool:
+        return self._synced_at is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._versions)
+
+    # --- Sync periódico en proceso ---
+    def _run(self, interval: float):
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                self.sync(db)
+            except Exception:
+                logger.exception("Token revocation sync failed")
+            finally:
+                db.close()
+            self._stop.wait(interval)
+
+    def start(self, interval: float = TOKEN_REVOCATION_SYNC_SECONDS):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="token-revocation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+revocation_list = RevocationList()
@@ -18,13 +18,48 @@ api.interceptors.request.use(
     }
 );
 
+// Un solo refresh en curso aunque fallen varias requests a la vez
+// (el backend revoca la sesión si un refresh token se usa dos veces)
+let refreshing = null;
+
+const refreshAccessToken = () => {
+    if (!refreshing) {
+        const refreshToken = localStorage.getItem('refresh_token');
+        refreshing = axios
+            .post(`${api.defaults.baseURL}/token/refresh`, { refresh_token: refreshToken })
+            .then((response) => {
+                localStorage.setItem('token', response.data.access_token);
+                localStorage.setItem('refresh_token', response.data.refresh_token);
+                return response.data.access_token;
+            })
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+};
+
 // Interceptor de respuesta para manejar errores de autenticación
 api.interceptors.response.use(
     (response) => response,
-    (error) => {
+    async (error) => {
+        const original = error.config;
+        if (error.response?.status === 401 && original && !original._retried &&
+            localStorage.getItem('refresh_token')) {
+            // Access token vencido: se renueva con el refresh token y se reintenta una vez
+            original._retried = true;
+            try {
+                const accessToken = await refreshAccessToken();
+                original.headers.Authorization = `Bearer ${accessToken}`;
+                return api(original);
+            } catch (refreshError) {
+                localStorage.removeItem('refresh_token');
+            }
+        }
         if (error.response?.status === 401) {
             // Token inválido o expirado
             localStorage.removeItem('token');
+            localStorage.removeItem('refresh_token');
             // Solo redirigir si no estamos ya en login o register
             if (!window.location.pathname.includes('/login') &&
                 !window.location.pathname.includes('/register')) {
@@ -20,8 +20,9 @@ export function useAuth() {
             const response = await api.post('/token', formData);
             const accessToken = response.data.access_token;
 
-            // Guardar token en localStorage y estado reactivo
+            // Guardar tokens en localStorage y estado reactivo
             localStorage.setItem('token', accessToken);
+            localStorage.setItem('refresh_token', response.data.refresh_token);
             token.value = accessToken;
 
             // Cargar información del usuario
@@ -52,7 +53,15 @@ export function useAuth() {
     };
 
     const logout = () => {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (refreshToken && token.value) {
+            // Revocar la sesión en el backend (sin esperar la respuesta)
+            api.post('/logout', { refresh_token: refreshToken }, {
+                headers: { Authorization: `Bearer ${token.value}` }
+            }).catch(() => {});
+        }
         localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
         token.value = null;
         user.value = null;
         router.push('/login');